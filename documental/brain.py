@@ -4,37 +4,209 @@ The Brain Module: The Seat of Consciousness
 This module is where the magic happens. It takes a dry, technical event string
 from the monitor, combines it with the printer's established personality, and
 consults the local Large Language Model (LLM) to form a thought.
+
+In the background, it also auditions every model the LLM servers offer and
+keeps a leaderboard, so each thought comes from the fastest model that still
+sticks to the persona's rules.
 """
 
+import json
+import statistics
+import threading
 import time
 
 import requests
 from requests.exceptions import ConnectionError, HTTPError, Timeout
 
-from .const import DEFAULT_ENDPOINT, MAX_RETRIES, RETRY_DELAY, Colors
-from .personality import SYSTEM_PROMPT
-from .utils import load_or_create_config
+from .const import (
+    LEADERBOARD_BENCHMARK_EVENT,
+    LEADERBOARD_CHECK_INTERVAL,
+    LEADERBOARD_REFRESH_INTERVAL,
+    LEADERBOARD_RUNS,
+    LEADERBOARD_TIMEOUT,
+    MAX_RETRIES,
+    MODEL_CACHE_SECONDS,
+    RETRY_DELAY,
+    Colors,
+)
+from .leaderboard import ModelLeaderboard
+from .router import AttemptCancelled
+from .settings import get_settings
 
-# Load configuration to get the endpoint.
-config = load_or_create_config()
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
 
-LM_STUDIO_ENDPOINT = config.get("llm", {}).get(
-    "lm_studio_endpoint", DEFAULT_ENDPOINT
-)
+# The model chosen for each endpoint and when the choice expires, so that
+# `/models` is not queried on every request. Entries are dropped when a
+# request to the endpoint fails or its models are benchmarked again.
+_model_cache = {}
+
+
+def get_leaderboard() -> ModelLeaderboard:
+    """Returns the model leaderboard, loading it from disk on first use."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                _leaderboard = ModelLeaderboard()
+    return _leaderboard
+
+
+def _list_models(endpoint: str, session: requests.Session) -> list:
+    """
+    Queries an LLM server for the IDs of the models it offers.
+
+    Raises:
+        requests.exceptions.RequestException: If the server cannot be reached.
+        KeyError: If the response does not contain any model ID.
+    """
+    model_response = session.get(f"{endpoint}/models", timeout=10)
+    model_response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx).
+    models = [model.get("id") for model in model_response.json().get("data", [])]
+    models = [model for model in models if model]
+    if not models:
+        raise KeyError(f"No model ID found. Response: {model_response.text}")
+    return models
+
+
+def _fetch_model_name(endpoint: str, session: requests.Session) -> str:
+    """
+    Picks the model to use on an LLM server.
+
+    This makes the system flexible, as the user doesn't need to hardcode the model name.
+    The fastest listed model that passed its benchmark is used. Until the
+    server's models have been benchmarked, the first model listed is used.
+    The choice is cached for `MODEL_CACHE_SECONDS`.
+
+    Raises:
+        requests.exceptions.RequestException: If the server cannot be reached.
+        KeyError: If the response does not contain a model ID.
+    """
+    cached = _model_cache.get(endpoint)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    print(f"Querying for models at: {endpoint}/models")
+    models = _list_models(endpoint, session)
+    model_name = get_leaderboard().fastest_model(endpoint, models) or models[0]
+    _model_cache[endpoint] = (model_name, time.monotonic() + MODEL_CACHE_SECONDS)
+    return model_name
+
+
+def _stream_completion(
+    endpoint: str, session: requests.Session, payload: dict, timeout: float, cancelled=None
+) -> tuple:
+    """
+    Streams a chat completion and times it.
+
+    Streaming lets a request that lost a hedge race stop as soon as the next
+    chunk arrives, instead of occupying its worker until the server is done.
+
+    Args:
+        endpoint: The LLM server's base URL.
+        session: The HTTP session to use.
+        payload: The chat completion request, without the `stream` flag.
+        timeout: The connect and per-chunk read timeout in seconds.
+        cancelled: An optional `threading.Event` that aborts the request when set.
+
+    Returns:
+        A tuple of (seconds to the first token or None, total seconds, raw answer text).
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+        ValueError, KeyError: If the stream is not in the expected format.
+        AttemptCancelled: If `cancelled` was set while streaming.
+    """
+    start = time.monotonic()
+    first_token = None
+    parts = []
+    response = session.post(
+        f"{endpoint}/chat/completions",
+        json=dict(payload, stream=True),
+        timeout=timeout,
+        stream=True,
+    )
+    try:
+        response.raise_for_status()
+        # The answer arrives as server-sent events: "data: {json}" lines, ending with "data: [DONE]".
+        for line in response.iter_lines(decode_unicode=True):
+            if cancelled is not None and cancelled.is_set():
+                raise AttemptCancelled()
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                if first_token is None:
+                    first_token = time.monotonic() - start
+                parts.append(content)
+    finally:
+        response.close()
+    return first_token, time.monotonic() - start, "".join(parts)
+
+
+def _clean_response(raw_content: str) -> str:
+    """Strips the quotes and prefixes some models wrap their answers in."""
+    raw_content = raw_content.strip()
+    if '"' in raw_content:
+        return raw_content.split('"')[1].strip()
+    if ":" in raw_content:
+        return raw_content.split(":")[-1].strip()
+    return raw_content
+
+
+def _request_completion(
+    endpoint: str, session: requests.Session, messages: list, cancelled=None
+) -> str:
+    """
+    Sends a chat completion request to a single LLM server and returns the cleaned-up text.
+
+    Raises:
+        requests.exceptions.RequestException: If the server cannot be reached.
+        KeyError, IndexError, ValueError: If the response is not in the expected format.
+        AttemptCancelled: If the router cancelled this attempt.
+    """
+    model_name = _fetch_model_name(endpoint, session)
+    print(f"Using model: {model_name} at {endpoint}")
+
+    try:
+        _, _, raw_content = _stream_completion(
+            endpoint,
+            session,
+            {
+                "model": model_name,
+                "messages": messages,
+                "temperature": 0.7,  # Controls the creativity of the response.
+            },
+            timeout=20,  # A longer timeout for the generation itself.
+            cancelled=cancelled,
+        )
+    except (requests.exceptions.RequestException, KeyError, IndexError, ValueError):
+        # The model may have been unloaded or replaced; look it up again next time.
+        _model_cache.pop(endpoint, None)
+        raise
+
+    # Some models wrap their responses in quotes or add prefixes.
+    # This is a defensive measure to clean up the output.
+    return _clean_response(raw_content)
 
 
 def get_llm_response(event_string: str) -> str:
     """
     Generates a human-readable message from a printer event string by querying a local LLM.
 
-    This function performs two main operations:
-    1.  It first queries the LLM server to get the ID of the currently loaded model.
-        This makes the system flexible, as the user doesn't need to hardcode the model name.
-    2.  It then sends the actual prompt (a combination of the system personality and the
-        specific printer event) to the LLM's chat completions endpoint.
+    The request is handed to the endpoint pool, which picks the configured LLM
+    server with the lowest measured latency and load, and hedges with a second
+    server if the first is unusually slow. On each server the currently loaded
+    model is discovered first, so the user doesn't need to hardcode the model name,
+    and then the prompt (the system personality plus the specific printer event)
+    is sent to the chat completions endpoint.
 
-    Both operations include a retry mechanism to handle cases where the LLM server
-    might be slow to start up or temporarily unavailable.
+    The whole exchange is retried to handle cases where the LLM servers might be
+    slow to start up or temporarily unavailable.
 
     Args:
         event_string: A detailed, human-readable string describing the printer event.
@@ -45,103 +217,37 @@ def get_llm_response(event_string: str) -> str:
     """
     print(f"{Colors.CYAN}--- Brain Module Invoked ---{Colors.RESET}")
 
-    # --- Step 1: Get the available model name from the server with retries ---
-    model_name = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            print(
-                f"Attempt {attempt + 1}/{MAX_RETRIES}: Querying for models at: {LM_STUDIO_ENDPOINT}/models"
-            )
-            # Request the list of available models from the server.
-            model_response = requests.get(f"{LM_STUDIO_ENDPOINT}/models", timeout=10)
-            model_response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx).
-            model_data = model_response.json()
-
-            # Extract the model ID from the response. We assume the first model is the one to use.
-            model_name = model_data.get("data", [{}])[0].get("id")
-            if not model_name:
-                return "Error: Could not determine the model name from LLM server. No model ID found."
-            print(f"Using model: {model_name}")
-            break  # If successful, exit the retry loop.
-
-        # --- Exception Handling for Model Discovery ---
-        except ConnectionError:
-            error_message = "Error: Could not connect to LLM server. Is it running?"
-        except HTTPError as e:
-            error_message = f"Error: LLM server returned status {e.response.status_code}. Check server logs."
-        except Timeout:
-            error_message = "Error: LLM model list request timed out."
-        except (IndexError, KeyError) as e:
-            # This handles cases where the JSON response is not in the expected format.
-            error_message = f"Error parsing model list from LLM server: {e}. Response: {model_response.text if 'model_response' in locals() else 'No response'}"
-        except requests.exceptions.RequestException as e:
-            error_message = (
-                f"An unexpected error occurred connecting to LLM server: {e}"
-            )
-
-        # If an error occurred, print it and decide whether to retry.
-        print(f"{Colors.RED}{error_message}{Colors.RESET}")
-        if attempt < MAX_RETRIES - 1:
-            print(f"Retrying in {RETRY_DELAY} seconds...")
-            time.sleep(RETRY_DELAY)
-        else:
-            # If all retries fail, return a final error message.
-            return f"Error: Failed to get LLM model name after {MAX_RETRIES} attempts. {error_message}"
-
-    # If model_name is still None after the loop, it means all attempts failed.
-    if not model_name:
-        return "Error: Failed to retrieve LLM model name."
+    # Take one consistent snapshot of the settings, so that a configuration
+    # reload mid-request doesn't mix an old persona with new endpoints.
+    settings = get_settings()
 
-    # --- Step 2: Construct the prompt for the LLM ---
     # The prompt consists of a system message (defining the personality) and a user message (the event).
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
+        settings.system_message,
         {"role": "user", "content": event_string},
     ]
 
-    # --- Step 3: Send the prompt to the LLM server with retries ---
     for attempt in range(MAX_RETRIES):
         try:
             print(
-                f"Attempt {attempt + 1}/{MAX_RETRIES}: Sending request to chat completions endpoint..."
+                f"Attempt {attempt + 1}/{MAX_RETRIES}: Sending request to the LLM endpoint pool..."
             )
-            # Post the request to the chat completions endpoint.
-            response = requests.post(
-                f"{LM_STUDIO_ENDPOINT}/chat/completions",
-                json={
-                    "model": model_name,
-                    "messages": messages,
-                    "temperature": 0.7,  # Controls the creativity of the response.
-                    "stream": False,  # We want the full response at once, not a stream.
-                },
-                timeout=20,  # A longer timeout for the generation itself.
+            return settings.endpoint_pool.call(
+                lambda endpoint, session, cancelled: _request_completion(
+                    endpoint, session, messages, cancelled
+                )
             )
-            response.raise_for_status()
-            response_data = response.json()
 
-            # --- Step 4: Extract and parse the response ---
-            # The actual message is nested in the JSON response.
-            raw_content = response_data["choices"][0]["message"]["content"].strip()
-
-            # Some models wrap their responses in quotes or add prefixes.
-            # This is a defensive measure to clean up the output.
-            if '"' in raw_content:
-                return raw_content.split('"')[1].strip()
-            if ":" in raw_content:
-                return raw_content.split(":")[-1].strip()
-
-            return raw_content  # Return the cleaned-up response.
-
-        # --- Exception Handling for Chat Completion ---
+        # --- Exception Handling ---
         except ConnectionError:
             error_message = "Error: Could not connect to LLM server. Is it running?"
         except HTTPError as e:
             error_message = f"Error: LLM server returned status {e.response.status_code}. Check server logs."
         except Timeout:
-            error_message = "Error: LLM chat completion request timed out."
-        except (KeyError, IndexError) as e:
+            error_message = "Error: LLM request timed out."
+        except (KeyError, IndexError, ValueError) as e:
             # Handles unexpected JSON structure from the server.
-            error_message = f"Error parsing response from LLM server: {e}. Response: {response.text if 'response' in locals() else 'No response'}"
+            error_message = f"Error parsing response from LLM server: {e}."
         except requests.exceptions.RequestException as e:
             error_message = (
                 f"An unexpected error occurred communicating with LLM server: {e}"
@@ -160,6 +266,89 @@ def get_llm_response(event_string: str) -> str:
     return "Error: Failed to get LLM response after all retries."
 
 
+def benchmark_endpoint(endpoint: str):
+    """
+    Benchmarks every model an LLM server lists and updates the leaderboard.
+
+    Each model answers the canned event `LEADERBOARD_RUNS` times, and the
+    median timings are recorded.
+    """
+    leaderboard = get_leaderboard()
+    messages = [
+        get_settings().system_message,
+        {"role": "user", "content": LEADERBOARD_BENCHMARK_EVENT},
+    ]
+    with requests.Session() as session:
+        try:
+            models = _list_models(endpoint, session)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            print(f"{Colors.YELLOW}Could not list the models at {endpoint} for benchmarking: {e}{Colors.RESET}")
+            return
+
+        for model in models:
+            print(f"{Colors.CYAN}Benchmarking model {model} at {endpoint}...{Colors.RESET}")
+            try:
+                runs = [
+                    _stream_completion(
+                        endpoint,
+                        session,
+                        {"model": model, "messages": messages, "temperature": 0.7},
+                        timeout=LEADERBOARD_TIMEOUT,
+                    )
+                    for _ in range(LEADERBOARD_RUNS)
+                ]
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                print(f"{Colors.YELLOW}Benchmark of {model} at {endpoint} failed: {e}{Colors.RESET}")
+                leaderboard.record_failure(endpoint, model, str(e))
+                continue
+            first_tokens = [ttft for ttft, _, _ in runs if ttft is not None]
+            leaderboard.record(
+                endpoint,
+                model,
+                statistics.median(first_tokens) if first_tokens else None,
+                statistics.median(total for _, total, _ in runs),
+                # Judge what the model actually said. _clean_response could
+                # reduce a rambling answer to a quoted word that passes.
+                [text.strip() for _, _, text in runs],
+            )
+
+    leaderboard.save()
+    # Let the next request pick up the new standings.
+    _model_cache.pop(endpoint, None)
+    print(f"{Colors.BLUE}--- Model Leaderboard for {endpoint} ---{Colors.RESET}")
+    for model, result in leaderboard.standings(endpoint):
+        if result.get("total") is None:
+            print(f"  {model}: failed ({result.get('error', 'unknown error')})")
+            continue
+        verdict = "ok" if result["passed"] else "fails the quality check"
+        ttft = f"{result['ttft']:.2f}s" if result["ttft"] is not None else "n/a"
+        print(f"  {model}: first token {ttft}, total {result['total']:.2f}s, {verdict}")
+
+
+def _run_benchmarks(stop_event: threading.Event):
+    # When each endpoint was last benchmarked. New endpoints from a config
+    # reload are picked up on the next check.
+    last_run = {}
+    while True:
+        for endpoint in get_settings().endpoints:
+            if stop_event.is_set():
+                return
+            if time.monotonic() - last_run.get(endpoint, float("-inf")) >= LEADERBOARD_REFRESH_INTERVAL:
+                benchmark_endpoint(endpoint)
+                last_run[endpoint] = time.monotonic()
+        if stop_event.wait(LEADERBOARD_CHECK_INTERVAL):
+            return
+
+
+def start_model_benchmarks() -> threading.Event:
+    """Starts benchmarking the available models in the background. Set the returned event to stop."""
+    stop_event = threading.Event()
+    threading.Thread(
+        target=_run_benchmarks, args=(stop_event,), name="model-benchmarks", daemon=True
+    ).start()
+    return stop_event
+
+
 if __name__ == "__main__":
     TEST_EVENT = "Job ID 124: Status change to 'ERROR' - Paper Jam"
     print(f"Testing with event: '{TEST_EVENT}'")
@@ -0,0 +1,179 @@
+"""
+The Checkpoint Module: The Bookmark
+
+This module lets the agent survive a restart without losing its place. The
+per-printer job tables and the orchestrator's record of which jobs were
+already announced are kept in a small checkpoint file. After a restart, each
+monitor diffs the saved job table against the live queue, so jobs that
+changed while the agent was down are still reported, and jobs that were
+already announced don't trigger a second round of alerts.
+
+A job table only advances when an event has been handled downstream, not when
+the monitor first sees the change. Events still held back by the debouncer or
+waiting in a queue when the agent stops are therefore reported again after
+the restart instead of being lost.
+
+Only state that changed is marked dirty, and the file is rewritten at most
+once per `CHECKPOINT_INTERVAL`, atomically, so a crash mid-write never
+corrupts it. The state is bounded by the size of the print queues, which keeps
+every write small.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .const import (
+    CHECKPOINT_INTERVAL,
+    CHECKPOINT_JOB_FIELDS,
+    CHECKPOINT_MAX_PROCESSED,
+    Colors,
+)
+from .replay import decode_event_object, encode_event_value
+
+CHECKPOINT_FILE_PATH = os.path.join(os.getcwd(), "checkpoint.json")
+
+
+class ProcessedJobs:
+    """
+    A bounded, set-like record of `(printer, job ID)` keys that were already announced.
+
+    It supports `in` and `add` like the plain set it replaces, and forgets the
+    oldest keys beyond `CHECKPOINT_MAX_PROCESSED`.
+    """
+
+    def __init__(self, store: "CheckpointStore", keys=()):
+        self._store = store
+        self._keys = OrderedDict((tuple(key), None) for key in keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key):
+        # Shares the store's lock so a background save never sees a half-updated record.
+        with self._store._lock:
+            self._keys[key] = None
+            while len(self._keys) > CHECKPOINT_MAX_PROCESSED:
+                self._keys.popitem(last=False)
+            self._store.mark_dirty()
+
+    def to_list(self) -> list:
+        return [list(key) for key in self._keys]
+
+
+class CheckpointStore:
+    """
+    Holds checkpointed monitor state and writes it to disk in the background.
+
+    Thread-safe: job tables are seeded by the printer watchers and advanced
+    by whoever handles their events, while the orchestrator updates the
+    processed jobs.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        data = self._load()
+        # Maps printer name -> {job ID: compact job}. Saved as a list per printer.
+        self._job_tables = {
+            printer_name: {job["JobId"]: job for job in jobs}
+            for printer_name, jobs in data.get("printers", {}).items()
+        }
+        self.processed = ProcessedJobs(self, data.get("processed", []))
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f, object_hook=decode_event_object)
+            print(
+                f"{Colors.GREEN}Restored checkpoint for {len(data.get('printers', {}))} printers from {self.path}.{Colors.RESET}"
+            )
+            return data
+        except (json.JSONDecodeError, IOError) as e:
+            print(
+                f"{Colors.YELLOW}Warning: Could not read checkpoint {self.path}. Starting fresh. Error: {e}{Colors.RESET}"
+            )
+            return {}
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def get_jobs(self, printer_name: str):
+        """Returns the saved job table for a printer, keyed by job ID, or None if there is none."""
+        with self._lock:
+            jobs = self._job_tables.get(printer_name)
+            return dict(jobs) if jobs is not None else None
+
+    @staticmethod
+    def _compact(job: dict) -> dict:
+        return {field: job[field] for field in CHECKPOINT_JOB_FIELDS if field in job}
+
+    def update_jobs(self, printer_name: str, jobs: dict):
+        """Replaces a printer's saved job table, e.g. to seed it on the first run."""
+        compact = {job_id: self._compact(job) for job_id, job in jobs.items()}
+        with self._lock:
+            self._job_tables[printer_name] = compact
+            self._dirty = True
+
+    def record_event(self, printer_name: str, event: dict):
+        """
+        Advances a printer's saved job table by one handled monitor event.
+
+        Called once the event has been dealt with downstream, so the checkpoint
+        never claims a state whose notification could still be lost.
+        """
+        job = event.get("job_info", {})
+        job_id = job.get("JobId")
+        with self._lock:
+            jobs = self._job_tables.setdefault(printer_name, {})
+            if event.get("event") == "job_deleted":
+                jobs.pop(job_id, None)
+            else:
+                jobs[job_id] = self._compact(job)
+            self._dirty = True
+
+    def save(self):
+        """Writes the checkpoint if anything changed since the last write."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "printers": {
+                    printer_name: list(jobs.values())
+                    for printer_name, jobs in self._job_tables.items()
+                },
+                "processed": self.processed.to_list(),
+            }
+            self._dirty = False
+            temp_path = f"{self.path}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, default=encode_event_value, separators=(",", ":"))
+                os.replace(temp_path, self.path)
+            except (IOError, OSError) as e:
+                self._dirty = True
+                print(f"{Colors.RED}Error: Could not write checkpoint {self.path}. Error: {e}{Colors.RESET}")
+
+    def _run(self):
+        while not self._stop.wait(CHECKPOINT_INTERVAL):
+            self.save()
+
+    def start(self):
+        """Starts saving the checkpoint periodically on a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the background saver and writes any pending changes."""
+        self._stop.set()
+        self.save()
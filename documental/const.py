@@ -19,6 +19,24 @@ RETRY_DELAY = 1
 DEFAULT_ENDPOINT = "http://localhost:1234/v1"
 
 
+# --- LLM Endpoint Routing ---
+# When several LLM servers are configured, the router measures each one and
+# sends requests to whichever currently looks fastest.
+
+# How many recent request latencies are kept per endpoint to estimate its p95.
+LATENCY_WINDOW = 50
+# Minimum number of measured requests before an endpoint's p95 is trusted for hedging.
+HEDGE_MIN_SAMPLES = 5
+# Consecutive failures after which an endpoint is temporarily removed from rotation.
+ENDPOINT_FAILURE_THRESHOLD = 3
+# Initial time in seconds a failing endpoint is benched. Doubles on each repeated ejection.
+ENDPOINT_EJECT_SECONDS = 10
+# Upper bound in seconds for how long an endpoint can be benched.
+ENDPOINT_MAX_EJECT_SECONDS = 300
+# How long, in seconds, the model chosen for an endpoint is reused before `/models` is asked again.
+MODEL_CACHE_SECONDS = 60
+
+
 # --- Color Constants for Console Output ---
 # This class uses ANSI escape codes to add color to console output, making it easier to read.
 # For example, errors can be printed in red and success messages in green.
@@ -50,3 +68,211 @@ PRE_DEFINED_PATTERNS: list[str] = [
     "report",
     "draft",
 ]
+
+
+# --- Print Job Status Flags ---
+# These mirror the `JOB_STATUS_*` values from the Win32 spooler API (and `win32print`).
+# Defining them here lets the parts of the pipeline that only inspect job data,
+# such as formatting and replaying recorded events, run without pywin32 installed.
+JOB_STATUS_PAUSED = 0x00000001
+JOB_STATUS_ERROR = 0x00000002
+JOB_STATUS_DELETING = 0x00000004
+JOB_STATUS_SPOOLING = 0x00000008
+JOB_STATUS_PRINTING = 0x00000010
+JOB_STATUS_OFFLINE = 0x00000020
+JOB_STATUS_PAPEROUT = 0x00000040
+JOB_STATUS_PRINTED = 0x00000080
+JOB_STATUS_DELETED = 0x00000100
+JOB_STATUS_BLOCKED_DEVQ = 0x00000200
+JOB_STATUS_USER_INTERVENTION = 0x00000400
+
+
+# --- Event Recording and Replay ---
+# Recorded spooler events are appended to a gzip-compressed JSON-lines file.
+
+# How often, in seconds, the recorder flushes buffered events to disk.
+RECORDER_FLUSH_INTERVAL = 5
+
+
+# --- Rolling Usage Windows ---
+# Per-user and per-document activity is tracked in small ring buffers so the
+# agent can talk about recent behaviour without storing a full print history.
+# Each window is defined as (bucket length in seconds, number of buckets).
+USAGE_WINDOWS: dict[str, tuple[int, int]] = {
+    "minute": (5, 12),
+    "hour": (300, 12),
+    "day": (3600, 24),
+}
+# Number of jobs from one user within the minute window that counts as a burst.
+BURST_THRESHOLD = 3
+# Local hours considered "late night". The range wraps around midnight.
+LATE_NIGHT_START_HOUR = 22
+LATE_NIGHT_END_HOUR = 5
+
+
+# --- Hub and Agent Mode ---
+# Lightweight agents on each print server stream their events over TCP to a
+# central hub that owns the memory, the LLM pool and the notifications.
+
+# Default TCP port the hub listens on.
+HUB_DEFAULT_PORT = 8765
+# Maximum number of events an agent sends in a single batch.
+HUB_BATCH_SIZE = 50
+# Longest time, in seconds, an agent waits to fill a batch before sending it.
+HUB_BATCH_INTERVAL = 0.5
+# Maximum number of unacknowledged events an agent buffers while the hub is unreachable.
+# When exceeded, the oldest events are dropped.
+AGENT_BUFFER_LIMIT = 10000
+# Upper bound in seconds for the agent's reconnect backoff.
+AGENT_RECONNECT_MAX_DELAY = 30
+
+
+# --- Document Family Detection ---
+# Near-duplicate document names ("report_final.docx", "report_final (1).docx",
+# "report_final_v2.docx") are grouped into families using MinHash signatures
+# over character n-grams, bucketed with locality-sensitive hashing.
+
+# Length of the character n-grams compared between document names.
+DOC_NGRAM_SIZE = 3
+# Number of LSH bands and rows per band. Their product is the MinHash signature length.
+# Eight bands of four rows make names with 80% n-gram overlap collide 98% of the time.
+DOC_LSH_BANDS = 8
+DOC_LSH_ROWS = 4
+# Minimum n-gram similarity for a name to join an existing family. Lower values
+# let unrelated names with a common word, like "report card" and "report", merge.
+DOC_SIMILARITY_THRESHOLD = 0.8
+
+
+# --- Monitor Status Debouncing ---
+# A job usually flaps through spooling, printing and printed within a second or two.
+# Status changes are held for this many seconds and collapsed into the latest one.
+# Can be overridden with `monitor.debounce_seconds` in `config.json`; 0 disables it.
+STATUS_DEBOUNCE_SECONDS = 2.0
+# Statuses that signal a problem. These always bypass the debounce.
+ERROR_STATUS_MASK = (
+    JOB_STATUS_ERROR
+    | JOB_STATUS_OFFLINE
+    | JOB_STATUS_PAPEROUT
+    | JOB_STATUS_USER_INTERVENTION
+    | JOB_STATUS_BLOCKED_DEVQ
+)
+
+
+# --- Printer Watcher Supervision ---
+# A supervisor keeps one watcher thread per installed printer, picking up new
+# printers, retiring removed ones and restarting watchers that crash.
+
+# How often, in seconds, the installed printers are re-enumerated.
+PRINTER_DISCOVERY_INTERVAL = 30
+# First delay, in seconds, before restarting a crashed watcher. Doubles on each consecutive crash.
+WATCHER_RESTART_DELAY = 2
+# Upper bound in seconds for the restart backoff.
+WATCHER_RESTART_MAX_DELAY = 300
+# A watcher that stays up this long is considered healthy again and its backoff resets.
+WATCHER_STABLE_SECONDS = 60
+# How often, in milliseconds, a watcher checks whether it has been asked to stop.
+WATCHER_STOP_CHECK_MS = 1000
+# How often, in seconds, the health of every watcher is logged.
+WATCHER_HEALTH_REPORT_INTERVAL = 600
+
+
+# --- Monitor Checkpoints ---
+# The monitor's job tables and the orchestrator's dedupe state are saved so a
+# restarted agent can pick up exactly where it left off.
+
+# How often, in seconds, changed checkpoint state is written to disk.
+CHECKPOINT_INTERVAL = 5
+# Maximum number of processed job keys remembered for dedupe. The oldest are forgotten first.
+CHECKPOINT_MAX_PROCESSED = 5000
+# Job fields kept in the checkpoint. These are all the pipeline needs to describe a job.
+CHECKPOINT_JOB_FIELDS = (
+    "JobId",
+    "Status",
+    "pDocument",
+    "pUserName",
+    "TotalPages",
+    "Size",
+    "Submitted",
+)
+
+
+# --- Adaptive Polling Fallback ---
+# Used for queues where the spooler refuses change notifications.
+
+# Fastest and slowest poll interval in seconds for a single queue.
+POLL_MIN_INTERVAL = 0.5
+POLL_MAX_INTERVAL = 30
+# Factor by which the interval grows after each idle poll.
+POLL_BACKOFF_FACTOR = 2
+# Fraction of one CPU core that all polled queues together may spend polling.
+POLL_CPU_BUDGET = 0.05
+
+
+# --- Hot Reload ---
+# How often, in seconds, `config.json` and the persona file are checked for changes.
+CONFIG_RELOAD_INTERVAL = 2
+
+
+# --- Digest Mode ---
+# Routine events can be summarized once per interval instead of one by one.
+
+# Default digest interval in seconds. 0 disables digest mode.
+DIGEST_INTERVAL_SECONDS = 0
+# Number of users and reprinted documents named in each digest.
+DIGEST_TOP_USERS = 3
+DIGEST_TOP_DOCUMENTS = 3
+
+
+# --- Job History ---
+# The columns of the history log and their `array` type codes. Every column
+# holds one fixed-width number per job. The order must never change.
+HISTORY_COLUMNS = (
+    ("timestamp", "q"),  # Submission time, Unix seconds.
+    ("day", "i"),  # Local calendar day, as a date ordinal.
+    ("week", "i"),  # Ordinal of the Monday starting the job's week.
+    ("hour", "B"),  # Local hour of day, 0-23.
+    ("weekday", "B"),  # Day of the week, Monday is 0.
+    ("printer", "I"),  # Index into the string dictionary.
+    ("user", "I"),  # Index into the string dictionary.
+    ("document", "I"),  # Index into the string dictionary.
+    ("pages", "i"),  # Total pages, 0 if unknown.
+    ("size", "q"),  # Size in bytes.
+)
+# Number of rows shown by default in each report.
+REPORT_DEFAULT_LIMIT = 20
+
+
+# --- Profiling ---
+# Seconds between stack samples taken for the flamegraph.
+PROFILE_SAMPLE_INTERVAL = 0.005
+# Number of stack frames tracemalloc keeps per allocation.
+PROFILE_TRACEMALLOC_FRAMES = 10
+# Number of source lines listed in the allocation summary.
+PROFILE_TOP_ALLOCATIONS = 25
+
+
+# --- Pipeline ---
+# How many events may be waiting on the LLM or on delivery at the same time.
+PIPELINE_MAX_IN_FLIGHT = 16
+
+
+# --- Model Leaderboard ---
+# Every model the LLM servers list is benchmarked, and the fastest one that
+# follows the persona's rules is used.
+
+# A canned event each model is asked to comment on.
+LEADERBOARD_BENCHMARK_EVENT = (
+    "A new print job was submitted: Document='quarterly_report_final_v3.docx', "
+    "User='dave.c', Pages=42. This is the 5th time 'dave.c' has printed. "
+    "Detected keywords in document name: report, final."
+)
+# Number of times each model answers the event. The median timings are kept.
+LEADERBOARD_RUNS = 2
+# Maximum number of words in an answer that passes the quality check.
+LEADERBOARD_MAX_WORDS = 20
+# Timeout in seconds for a single benchmark request. Loading a model can take a while.
+LEADERBOARD_TIMEOUT = 120
+# How often, in seconds, every model is benchmarked again.
+LEADERBOARD_REFRESH_INTERVAL = 3600
+# How often, in seconds, the benchmark thread checks for endpoints that are due.
+LEADERBOARD_CHECK_INTERVAL = 30
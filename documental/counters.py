@@ -0,0 +1,71 @@
+"""
+The Counters Module: The Tally Marks
+
+This module provides fixed-size rolling counters that answer questions like
+"how many times has this user printed in the last hour?" without keeping or
+scanning a full print history. Each counter is a small ring of time buckets.
+Recording an event touches a single bucket, and reading a window sums a
+handful of buckets, so the cost never grows with the number of prints.
+"""
+
+
+class RollingCounter:
+    """
+    Counts events over a sliding time window using a ring of buckets.
+
+    The window is `bucket_seconds * bucket_count` seconds long. Buckets that
+    have fallen out of the window are cleared lazily the next time the counter
+    is advanced, so no background maintenance is needed.
+    """
+
+    def __init__(self, bucket_seconds: int, bucket_count: int, head: int = 0, counts=None):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        # The absolute index (timestamp // bucket_seconds) of the newest bucket.
+        self.head = head
+        self.counts = list(counts) if counts else [0] * bucket_count
+
+    def _advance(self, index: int):
+        """Moves the head forward to `index`, zeroing the buckets that were skipped."""
+        if index <= self.head:
+            return
+        if index - self.head >= self.bucket_count:
+            self.counts = [0] * self.bucket_count
+        else:
+            for skipped in range(self.head + 1, index + 1):
+                self.counts[skipped % self.bucket_count] = 0
+        self.head = index
+
+    def add(self, timestamp: float, amount: int = 1):
+        """Records `amount` events at the given Unix timestamp."""
+        index = int(timestamp // self.bucket_seconds)
+        self._advance(index)
+        # Events older than the window are silently dropped.
+        if index > self.head - self.bucket_count:
+            self.counts[index % self.bucket_count] += amount
+
+    def total(self, timestamp: float) -> int:
+        """Returns the number of events in the window ending at the given timestamp."""
+        index = int(timestamp // self.bucket_seconds)
+        # Only buckets that are both inside the requested window and still stored count.
+        oldest = max(index, self.head) - self.bucket_count + 1
+        newest = min(index, self.head)
+        return sum(
+            self.counts[i % self.bucket_count] for i in range(oldest, newest + 1)
+        )
+
+    def to_list(self) -> list:
+        """Serializes the counter into a compact `[head, counts]` pair for JSON storage."""
+        return [self.head, self.counts]
+
+    @classmethod
+    def from_list(cls, data, bucket_seconds: int, bucket_count: int) -> "RollingCounter":
+        """
+        Restores a counter saved with `to_list`.
+
+        If the stored data is missing or was written with a different bucket
+        count, an empty counter is returned instead.
+        """
+        if not data or len(data) != 2 or len(data[1]) != bucket_count:
+            return cls(bucket_seconds, bucket_count)
+        return cls(bucket_seconds, bucket_count, head=data[0], counts=data[1])
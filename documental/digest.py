@@ -0,0 +1,136 @@
+"""
+The Digest Module: The Weekly Gossip Column
+
+Most print jobs are not worth a remark of their own. In digest mode, routine
+arrivals and completions are quietly tallied per printer instead of being
+sent to the LLM one by one. Once a printer's interval is up, the tally is
+condensed into a short statistical summary (busiest users, pages, reprints
+and keyword hits) and the agent comments on the whole batch at once. The
+number of LLM calls then depends on the clock, not on how much people print.
+"""
+
+import time
+from collections import Counter
+
+from .const import DIGEST_TOP_DOCUMENTS, DIGEST_TOP_USERS
+
+
+class PrinterDigest:
+    """The activity collected for one printer during the current interval."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.new_jobs = 0
+        self.finished_jobs = 0
+        self.pages = 0
+        self.user_jobs = Counter()
+        self.user_pages = Counter()
+        self.reprints = Counter()
+        self.keyword_hits = Counter()
+
+    def add(self, event_data: dict, reprint: bool = False, keywords: list = ()):
+        """Folds one low-priority event into the tally."""
+        job_info = event_data.get("job_info", {})
+        if event_data.get("event") != "new_job":
+            self.finished_jobs += 1
+            return
+
+        user_name = job_info.get("pUserName", "N/A")
+        pages = job_info.get("TotalPages") or 0
+        self.new_jobs += 1
+        self.pages += pages
+        self.user_jobs[user_name] += 1
+        self.user_pages[user_name] += pages
+        if reprint:
+            self.reprints[job_info.get("pDocument", "N/A")] += 1
+        self.keyword_hits.update(keywords)
+
+    def summarize(self, printer_name: str, now: float) -> str:
+        """Describes the interval's activity as a prompt for the LLM."""
+        minutes = max(1, round((now - self.started) / 60))
+        parts = [
+            f"Digest of routine activity on printer '{printer_name}' over the last {minutes} minutes: "
+            f"{self.new_jobs} new jobs totalling {self.pages} pages, "
+            f"and {self.finished_jobs} jobs completed or removed."
+        ]
+
+        if self.user_jobs:
+            top_users = ", ".join(
+                f"'{user}' ({count} jobs, {self.user_pages[user]} pages)"
+                for user, count in self.user_jobs.most_common(DIGEST_TOP_USERS)
+            )
+            parts.append(f"Busiest users: {top_users}.")
+
+        if self.reprints:
+            top_reprints = ", ".join(
+                f"'{doc}' ({count}x)"
+                for doc, count in self.reprints.most_common(DIGEST_TOP_DOCUMENTS)
+            )
+            parts.append(
+                f"{sum(self.reprints.values())} of the jobs were reprints, most often {top_reprints}."
+            )
+
+        if self.keyword_hits:
+            hits = ", ".join(
+                f"{keyword} ({count}x)" for keyword, count in self.keyword_hits.most_common()
+            )
+            parts.append(f"Detected keywords in document names: {hits}.")
+
+        parts.append("Comment on this batch as a whole.")
+        return " ".join(parts)
+
+
+class DigestScheduler:
+    """
+    Collects low-priority events per printer and releases one summary per interval.
+
+    A printer's interval starts with the first event it receives, so idle
+    printers never produce empty digests. The interval may be a number or a
+    callable returning one, so it can follow the live settings.
+    """
+
+    def __init__(self, interval):
+        self._interval = interval if callable(interval) else (lambda: interval)
+        self.digests = {}
+
+    @property
+    def interval(self) -> float:
+        return self._interval()
+
+    def add(self, printer_name: str, event_data: dict, reprint: bool = False, keywords: list = ()):
+        """Adds an event to the printer's current digest, opening one if needed."""
+        digest = self.digests.get(printer_name)
+        if digest is None:
+            digest = self.digests[printer_name] = PrinterDigest(time.monotonic())
+        digest.add(event_data, reprint=reprint, keywords=keywords)
+
+    def next_due(self, now: float = None):
+        """Seconds until the next digest is due, or None if nothing is pending."""
+        if not self.digests:
+            return None
+        now = time.monotonic() if now is None else now
+        oldest = min(digest.started for digest in self.digests.values())
+        return max(0.0, oldest + self.interval - now)
+
+    def due(self, now: float = None, flush: bool = False) -> list:
+        """
+        Removes and summarizes the digests whose interval has passed.
+
+        Args:
+            now: The current `time.monotonic()` value. Defaults to now.
+            flush: If True, every pending digest is released regardless of age.
+
+        Returns:
+            A list of (printer name, summary prompt) tuples.
+        """
+        now = time.monotonic() if now is None else now
+        interval = self.interval
+        ready = [
+            printer_name
+            for printer_name, digest in self.digests.items()
+            if flush or now - digest.started >= interval
+        ]
+        return [
+            (printer_name, self.digests.pop(printer_name).summarize(printer_name, now))
+            for printer_name in ready
+        ]
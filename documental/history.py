@@ -0,0 +1,233 @@
+"""
+The History Module: The Ledger
+
+The memory module only keeps running totals, which is enough for snark but
+not for questions like "who printed the most last month?". This module keeps
+a complete, append-only log of every print job in a compact columnar format,
+so reports over millions of jobs stay fast.
+
+The log is a directory with one binary file per column. Each file is a flat
+array of fixed-width numbers in native byte order, so a row is simply the
+same index in every file. Users, printers and documents are stored as
+numbers that index into `strings.jsonl`, a string dictionary with one JSON
+string per line. Dates are precomputed when a job is written (day, week,
+hour and weekday), so readers never have to touch a datetime.
+
+Readers memory-map the column files and get typed `memoryview`s over them,
+which can be sliced and counted without copying or parsing anything.
+"""
+
+import json
+import mmap
+import os
+import time
+from array import array
+from datetime import date, datetime
+
+from .const import HISTORY_COLUMNS, Colors
+
+HISTORY_DIR_PATH = os.path.join(os.getcwd(), "history")
+STRINGS_FILE_NAME = "strings.jsonl"
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, f"{name}.col")
+
+
+def _row_counts(path: str) -> dict:
+    """The number of complete values in each column file."""
+    counts = {}
+    for name, typecode in HISTORY_COLUMNS:
+        try:
+            size = os.path.getsize(_column_path(path, name))
+        except OSError:
+            size = 0
+        counts[name] = size // array(typecode).itemsize
+    return counts
+
+
+def _clamp(value, typecode: str) -> int:
+    """Limits a value to the range a column of the given typecode can hold."""
+    bits = array(typecode).itemsize * 8
+    if typecode.isupper():
+        return min(max(int(value), 0), 2**bits - 1)
+    return min(max(int(value), -(2 ** (bits - 1))), 2 ** (bits - 1) - 1)
+
+
+def day_to_date(day: int) -> date:
+    """Converts a value from the `day` or `week` column back into a date."""
+    return date.fromordinal(day)
+
+
+class JobHistoryWriter:
+    """
+    Appends print jobs to the columnar history log.
+
+    Rows are written column by column, so a crash can leave some columns one
+    row longer than others. When the log is opened, every column is trimmed
+    back to the last row that is complete in all of them.
+    """
+
+    def __init__(self, path: str = HISTORY_DIR_PATH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.rows = min(_row_counts(path).values())
+        for name, typecode in HISTORY_COLUMNS:
+            with open(_column_path(path, name), "ab") as f:
+                f.truncate(self.rows * array(typecode).itemsize)
+
+        self.string_ids = {}
+        strings_path = os.path.join(path, STRINGS_FILE_NAME)
+        if os.path.exists(strings_path):
+            torn = False
+            with open(strings_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.string_ids[json.loads(line)] = len(self.string_ids)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash. Any row that needed it was trimmed above.
+                        torn = True
+                        break
+            if torn:
+                # Rewrite the dictionary without the torn line, so new strings line up.
+                with open(strings_path, "w", encoding="utf-8") as f:
+                    for text in self.string_ids:
+                        f.write(json.dumps(text) + "\n")
+
+        self._strings = open(strings_path, "a", encoding="utf-8")
+        # Unbuffered, so a failed write never leaves bytes behind to be flushed later.
+        self._columns = {
+            name: (typecode, open(_column_path(path, name), "ab", buffering=0))
+            for name, typecode in HISTORY_COLUMNS
+        }
+
+    def _string_id(self, text: str) -> int:
+        """Returns the dictionary index of a string, adding it if it is new."""
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.string_ids)
+            self._strings.write(json.dumps(text) + "\n")
+            self._strings.flush()
+        return string_id
+
+    def append(self, printer_name: str, job_info: dict):
+        """
+        Adds one print job to the log.
+
+        Values too large for their column are clamped to its range. A job that
+        can't be written, for example because the disk is full, is left out
+        with a warning, and any columns it reached are trimmed back so rows
+        stay aligned.
+        """
+        try:
+            submitted = job_info.get("Submitted")
+            timestamp = submitted.timestamp() if isinstance(submitted, datetime) else time.time()
+            local = datetime.fromtimestamp(timestamp)
+            day = local.toordinal()
+
+            row = {
+                "timestamp": int(timestamp),
+                "day": day,
+                "week": day - local.weekday(),
+                "hour": local.hour,
+                "weekday": local.weekday(),
+                "printer": self._string_id(printer_name),
+                "user": self._string_id(job_info.get("pUserName") or "N/A"),
+                "document": self._string_id(job_info.get("pDocument") or "N/A"),
+                "pages": max(0, job_info.get("TotalPages") or 0),
+                "size": max(0, job_info.get("Size") or 0),
+            }
+            encoded = [
+                (typecode, f, array(typecode, (_clamp(row[name], typecode),)).tobytes())
+                for name, (typecode, f) in self._columns.items()
+            ]
+        except (OSError, OverflowError, TypeError, ValueError) as e:
+            print(f"{Colors.YELLOW}Could not add a job to the history: {e}{Colors.RESET}")
+            return
+
+        try:
+            for _, f, data in encoded:
+                if f.write(data) != len(data):
+                    raise OSError("short write, the disk may be full")
+        except OSError as e:
+            print(f"{Colors.RED}Could not write a job to the history: {e}{Colors.RESET}")
+            for typecode, f, _ in encoded:
+                try:
+                    f.truncate(self.rows * array(typecode).itemsize)
+                except OSError:
+                    # Reopening the log trims it to the last complete row anyway.
+                    pass
+            return
+        self.rows += 1
+
+    def close(self):
+        self._strings.close()
+        for _, f in self._columns.values():
+            f.close()
+
+
+def open_history_writer(path: str = HISTORY_DIR_PATH):
+    """Opens the history log for writing, or returns None if it can't be opened."""
+    try:
+        return JobHistoryWriter(path)
+    except (OSError, ValueError) as e:
+        print(f"{Colors.RED}Could not open the job history at {path}. History is disabled. Error: {e}{Colors.RESET}")
+        return None
+
+
+class JobHistoryReader:
+    """
+    A read-only, memory-mapped view of the history log.
+
+    Each column is exposed as a typed `memoryview` in `columns`, `strings`
+    maps dictionary indexes back to names, and `string_ids` maps names to
+    their indexes. Use it as a context manager so the mappings are released
+    when the report is done.
+    """
+
+    def __init__(self, path: str = HISTORY_DIR_PATH):
+        self.path = path
+        self.rows = min(_row_counts(path).values())
+
+        strings_path = os.path.join(path, STRINGS_FILE_NAME)
+        self.strings = []
+        if os.path.exists(strings_path):
+            with open(strings_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.strings.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+        self.string_ids = {}
+        for string_id, text in enumerate(self.strings):
+            self.string_ids.setdefault(text, string_id)
+
+        self._maps = []
+        self.columns = {}
+        for name, typecode in HISTORY_COLUMNS:
+            length = self.rows * array(typecode).itemsize
+            if not length:
+                self.columns[name] = memoryview(array(typecode))
+                continue
+            with open(_column_path(path, name), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            raw = memoryview(mapped)
+            self._maps.append((mapped, raw))
+            # Only whole rows are exposed, even if a writer is halfway through one.
+            self.columns[name] = raw[:length].cast(typecode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        for mapped, raw in self._maps:
+            raw.release()
+            mapped.close()
+        self._maps = []
@@ -0,0 +1,442 @@
+"""
+The Hub Module: The Hive Mind
+
+This module splits DocuMental into a central hub and any number of lightweight
+agents. Agents run on the print servers and only watch their printer queues,
+streaming the events to the hub over a simple TCP protocol. The hub owns the
+shared memory, the LLM pool and the notifications, so a user's habits are
+remembered across every print server and only one box needs LLM capacity.
+
+The protocol is newline-delimited JSON:
+
+* Agent to hub: `{"type": "hello", "agent": NAME, "session": ID}` once per
+  connection, followed by `{"type": "batch", "seq": N, "events": [[PRINTER, EVENT], ...]}`.
+* Hub to agent: `{"type": "ack", "seq": N}` once every event of a batch has
+  been processed.
+
+Agents keep every batch until it is acknowledged and resend the unacknowledged
+ones after reconnecting. Since acknowledgements wait for processing, events
+that were still queued when the hub went down are sent again. The hub
+remembers the last sequence number seen from each agent session, so a batch
+that arrives twice is only processed once. Malformed messages are logged and
+skipped without dropping the connection.
+"""
+
+import json
+import queue
+import select
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from .const import (
+    AGENT_BUFFER_LIMIT,
+    AGENT_RECONNECT_MAX_DELAY,
+    HUB_BATCH_INTERVAL,
+    HUB_BATCH_SIZE,
+    HUB_DEFAULT_PORT,
+    Colors,
+)
+from .replay import REPLAY_FINISHED, decode_event_object, encode_event_value
+
+
+def parse_address(text: str, default_host: str = "0.0.0.0") -> tuple:
+    """Parses a `HOST:PORT`, `HOST` or `:PORT` string into a `(host, port)` tuple."""
+    host, _, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return host or default_host, int(port) if port else HUB_DEFAULT_PORT
+
+
+def _encode_message(message: dict) -> bytes:
+    """Serializes a protocol message as a single line of JSON."""
+    return (
+        json.dumps(message, default=encode_event_value, separators=(",", ":")) + "\n"
+    ).encode("utf-8")
+
+
+def _decode_message(line: bytes) -> dict:
+    """
+    Parses a single line of the protocol.
+
+    Raises:
+        ValueError: If the line is not a JSON object.
+    """
+    message = json.loads(line, object_hook=decode_event_object)
+    if not isinstance(message, dict):
+        raise ValueError(f"expected a JSON object, got {type(message).__name__}")
+    return message
+
+
+# The job fields the hub reads, with the types an agent's monitor produces.
+# Missing optional fields are fine, ones of the wrong type are not.
+_JOB_INFO_TYPES = {
+    "pDocument": str,
+    "pUserName": str,
+    "TotalPages": int,
+    "PagesPrinted": int,
+    "Size": int,
+    "Submitted": datetime,
+}
+
+
+def _is_int(value) -> bool:
+    """Returns True for real integers, which `bool` is not meant to be here."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _valid_event(event) -> bool:
+    """Checks that an event and its `job_info` have the shape the pipeline relies on."""
+    if not isinstance(event, dict):
+        return False
+    job_info = event.get("job_info")
+    if not isinstance(job_info, dict):
+        return False
+    if not _is_int(job_info.get("JobId")) or not _is_int(job_info.get("Status")):
+        return False
+    for field, expected in _JOB_INFO_TYPES.items():
+        value = job_info.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, expected) or (expected is int and not _is_int(value)):
+            return False
+    return True
+
+
+def _valid_events(events) -> list:
+    """Returns the well-formed `[printer, event]` pairs of a batch."""
+    if not isinstance(events, list):
+        return []
+    return [
+        pair
+        for pair in events
+        if isinstance(pair, list)
+        and len(pair) == 2
+        and isinstance(pair[0], str)
+        and _valid_event(pair[1])
+    ]
+
+
+# --- Hub Side ---
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """Serves a single agent connection for as long as it stays open."""
+
+    def setup(self):
+        super().setup()
+        # Acknowledgements are written by whichever thread finishes a batch.
+        self.write_lock = threading.Lock()
+
+    def send(self, message: dict) -> bool:
+        """Writes a message to the agent. Returns False if the connection is gone."""
+        try:
+            with self.write_lock:
+                self.wfile.write(_encode_message(message))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def handle(self):
+        agent_name, session = None, None
+        peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        try:
+            for line in self.rfile:
+                try:
+                    message = _decode_message(line)
+                except ValueError as e:
+                    print(f"{Colors.YELLOW}Ignoring malformed message from {peer}: {e}{Colors.RESET}")
+                    continue
+                message_type = message.get("type")
+
+                if message_type == "hello":
+                    agent_name = message.get("agent")
+                    if not isinstance(agent_name, str) or not agent_name:
+                        agent_name = peer
+                    session = message.get("session")
+                    if not isinstance(session, str):
+                        session = None
+                    self.server.register(agent_name, session, self)
+                    print(
+                        f"{Colors.GREEN}Agent '{agent_name}' connected from {peer}.{Colors.RESET}"
+                    )
+                elif message_type == "batch":
+                    if agent_name is None:
+                        print(
+                            f"{Colors.YELLOW}Ignoring batch from {peer} sent before hello.{Colors.RESET}"
+                        )
+                        continue
+                    seq = message.get("seq")
+                    if not isinstance(seq, int) or isinstance(seq, bool):
+                        print(
+                            f"{Colors.YELLOW}Ignoring batch from {peer} without a valid sequence number.{Colors.RESET}"
+                        )
+                        continue
+                    received = message.get("events")
+                    events = _valid_events(received)
+                    skipped = (len(received) if isinstance(received, list) else 0) - len(events)
+                    if skipped:
+                        print(
+                            f"{Colors.YELLOW}Skipped {skipped} malformed events in batch {seq} from '{agent_name}'.{Colors.RESET}"
+                        )
+                    self.server.accept_batch(agent_name, session, seq, events)
+                else:
+                    print(
+                        f"{Colors.YELLOW}Unknown message from {peer}: {message_type}{Colors.RESET}"
+                    )
+        except OSError as e:
+            print(f"{Colors.YELLOW}Connection to {peer} failed: {e}{Colors.RESET}")
+        finally:
+            if agent_name is not None:
+                self.server.unregister(agent_name, session, self)
+            print(f"Agent '{agent_name or peer}' disconnected.")
+
+
+class HubServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Accepts agent connections and feeds their events into the local event queue.
+
+    Events are queued as `(f"{agent}/{printer}", event, on_processed)` so that
+    printers with the same name on different servers stay distinguishable
+    downstream. The consumer calls `on_processed()` once it is done with the
+    event, and a batch is acknowledged when all of its events are done.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, event_queue: queue.Queue):
+        super().__init__(address, _AgentHandler)
+        self.event_queue = event_queue
+        # The last batch sequence number accepted from each (agent, session).
+        self._last_seq = {}
+        # Per (agent, session): the sequence numbers of accepted batches that
+        # are still being processed, mapped to how many of their events are left.
+        self._outstanding = {}
+        # The open connection of each (agent, session), where acks are sent.
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def register(self, agent_name: str, session: str, handler: _AgentHandler):
+        """Makes a connection the one that receives the agent session's acks."""
+        with self._lock:
+            self._connections[(agent_name, session)] = handler
+
+    def unregister(self, agent_name: str, session: str, handler: _AgentHandler):
+        """Forgets a closed connection, unless the agent has already reconnected."""
+        key = (agent_name, session)
+        with self._lock:
+            if self._connections.get(key) is handler:
+                del self._connections[key]
+
+    def _ack(self, key: tuple, seq: int):
+        with self._lock:
+            handler = self._connections.get(key)
+        # If the agent is not connected right now, it resends the batch after
+        # reconnecting and the duplicate is acknowledged straight away.
+        if handler is not None:
+            handler.send({"type": "ack", "seq": seq})
+
+    def _event_processed(self, key: tuple, seq: int):
+        """Counts down a batch's remaining events and acknowledges it when none are left."""
+        with self._lock:
+            outstanding = self._outstanding[key]
+            outstanding[seq] -= 1
+            if outstanding[seq]:
+                return
+            del outstanding[seq]
+        self._ack(key, seq)
+
+    def accept_batch(self, agent_name: str, session: str, seq: int, events: list):
+        """
+        Queues a batch of events unless it was already received on an earlier connection.
+
+        A duplicate is acknowledged right away if it was processed already, and
+        otherwise once the original is done.
+        """
+        key = (agent_name, session)
+        with self._lock:
+            outstanding = self._outstanding.setdefault(key, {})
+            if seq <= self._last_seq.get(key, 0):
+                duplicate_done = seq not in outstanding
+            else:
+                duplicate_done = None
+                self._last_seq[key] = seq
+                if events:
+                    outstanding[seq] = len(events)
+                # Queued while holding the lock so that batches from one agent
+                # cannot overtake each other across reconnects.
+                for printer_name, event in events:
+                    self.event_queue.put(
+                        (
+                            f"{agent_name}/{printer_name}",
+                            event,
+                            lambda: self._event_processed(key, seq),
+                        )
+                    )
+        if duplicate_done is False:
+            return
+        if duplicate_done or not events:
+            self._ack(key, seq)
+
+
+def start_hub(address: tuple, event_queue: queue.Queue) -> HubServer:
+    """Starts the hub server on a background thread and returns it."""
+    server = HubServer(address, event_queue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(
+        f"{Colors.GREEN}Hub listening for agents on {address[0]}:{address[1]}.{Colors.RESET}"
+    )
+    return server
+
+
+# --- Agent Side ---
+
+
+class HubAgent:
+    """
+    Forwards events from the local event queue to a hub, in acknowledged batches.
+
+    While the hub is unreachable, events keep being collected (up to
+    `AGENT_BUFFER_LIMIT`) and are delivered in order once the connection is back.
+    Queue items may carry an `on_processed` callback as a third element, which
+    is called once the hub has acknowledged the event.
+    """
+
+    def __init__(self, address: tuple, agent_name: str, event_queue: queue.Queue):
+        self.address = address
+        self.agent_name = agent_name
+        self.event_queue = event_queue
+        # A fresh session per process lets the hub tell a restarted agent
+        # (whose sequence numbers start over) from a reconnecting one.
+        self.session = uuid.uuid4().hex
+        self.next_seq = 1
+        # Both hold `([printer, event], on_processed)` entries.
+        self.unacked = OrderedDict()
+        self.pending = []
+        self.finished = False
+        self._buffer = b""
+
+    def _buffered_count(self) -> int:
+        return len(self.pending) + sum(len(events) for events in self.unacked.values())
+
+    def _collect(self, timeout: float, limit=HUB_BATCH_SIZE):
+        """
+        Moves events from the local queue into `pending`.
+
+        Waits up to `timeout` seconds for events, stopping early once `limit`
+        events are pending. A limit of None drains everything that arrives.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.finished and (limit is None or len(self.pending) < limit):
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    printer_name, event, *callbacks = self.event_queue.get(timeout=remaining)
+                else:
+                    printer_name, event, *callbacks = self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is REPLAY_FINISHED:
+                self.finished = True
+            elif isinstance(event, dict):
+                self.pending.append(([printer_name, event], callbacks[0] if callbacks else None))
+
+        # Never let an unreachable hub exhaust the agent's memory.
+        overflow = self._buffered_count() - AGENT_BUFFER_LIMIT
+        if overflow > 0:
+            print(
+                f"{Colors.YELLOW}Hub buffer full. Dropping the {overflow} oldest events.{Colors.RESET}"
+            )
+            while overflow > 0 and self.unacked:
+                seq, events = next(iter(self.unacked.items()))
+                dropped = min(overflow, len(events))
+                del events[:dropped]
+                if not events:
+                    del self.unacked[seq]
+                overflow -= dropped
+            del self.pending[:overflow]
+
+    def _read_acks(self, sock: socket.socket, timeout: float):
+        """Processes any acknowledgements that arrive within `timeout` seconds."""
+        readable, _, _ = select.select([sock], [], [], timeout)
+        if not readable:
+            return
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("hub closed the connection")
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                message = _decode_message(line)
+                if message.get("type") == "ack":
+                    for _, on_processed in self.unacked.pop(message.get("seq"), ()):
+                        if on_processed:
+                            on_processed()
+
+    def _serve(self, sock: socket.socket):
+        """Runs one connection until it fails or everything has been delivered."""
+        self._buffer = b""
+        sock.sendall(
+            _encode_message(
+                {"type": "hello", "agent": self.agent_name, "session": self.session}
+            )
+        )
+        # Replay whatever the previous connection left unacknowledged.
+        for seq, entries in self.unacked.items():
+            events = [pair for pair, _ in entries]
+            sock.sendall(_encode_message({"type": "batch", "seq": seq, "events": events}))
+        if self.unacked:
+            print(f"Resent {len(self.unacked)} unacknowledged batches to the hub.")
+
+        while True:
+            if not self.finished:
+                self._collect(HUB_BATCH_INTERVAL)
+
+            if self.pending:
+                seq = self.next_seq
+                self.next_seq += 1
+                entries, self.pending = self.pending[:HUB_BATCH_SIZE], self.pending[HUB_BATCH_SIZE:]
+                self.unacked[seq] = entries
+                events = [pair for pair, _ in entries]
+                sock.sendall(_encode_message({"type": "batch", "seq": seq, "events": events}))
+
+            self._read_acks(sock, HUB_BATCH_INTERVAL if self.finished else 0)
+
+            if self.finished and not self.pending and not self.unacked:
+                return
+
+    def run(self):
+        """Connects to the hub and forwards events until the local source is exhausted."""
+        delay = 1
+        while True:
+            try:
+                sock = socket.create_connection(self.address, timeout=10)
+            except OSError as e:
+                print(
+                    f"{Colors.YELLOW}Could not reach hub at {self.address[0]}:{self.address[1]}: {e}. "
+                    f"Retrying in {delay} seconds ({self._buffered_count()} events buffered).{Colors.RESET}"
+                )
+                # Keep draining the local queue while we wait, so the buffer limit applies.
+                retry_at = time.monotonic() + delay
+                self._collect(delay, limit=None)
+                time.sleep(max(0.0, retry_at - time.monotonic()))
+                delay = min(delay * 2, AGENT_RECONNECT_MAX_DELAY)
+                continue
+
+            print(
+                f"{Colors.GREEN}Connected to hub at {self.address[0]}:{self.address[1]} as '{self.agent_name}'.{Colors.RESET}"
+            )
+            delay = 1
+            try:
+                self._serve(sock)
+                print(f"{Colors.CYAN}All events delivered to the hub.{Colors.RESET}")
+                return
+            except (OSError, ValueError) as e:
+                print(f"{Colors.YELLOW}Lost connection to hub: {e}{Colors.RESET}")
+            finally:
+                sock.close()
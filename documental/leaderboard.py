@@ -0,0 +1,140 @@
+"""
+The Leaderboard Module: The Talent Show
+
+An LLM server often lists several models, and the first one listed is
+frequently a large model that takes ages to produce a one-line alert. This
+module keeps score. Every model is periodically auditioned with a canned
+printer event, and its time to first token, total latency and whether its
+answer follows the persona's rules (one sentence, within the word limit) are
+recorded in `leaderboard.json`. The brain then uses the fastest model that
+passed the audition.
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from .const import LEADERBOARD_MAX_WORDS, Colors
+
+LEADERBOARD_FILE_PATH = os.path.join(os.getcwd(), "leaderboard.json")
+
+# Splits text into sentences at '.', '!' or '?' followed by whitespace or the end.
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s+|$)")
+
+
+def passes_quality_check(text: str) -> bool:
+    """
+    Checks whether a benchmark answer is usable as an alert.
+
+    It must be a single sentence of at most `LEADERBOARD_MAX_WORDS` words,
+    with no leftover reasoning markup.
+    """
+    words = text.split()
+    if not words or len(words) > LEADERBOARD_MAX_WORDS:
+        return False
+    if "<think>" in text or "</think>" in text:
+        return False
+    sentences = [part for part in _SENTENCE_END.split(text.strip()) if part.strip()]
+    return len(sentences) == 1
+
+
+class ModelLeaderboard:
+    """
+    Benchmark results per endpoint and model, persisted to disk.
+
+    Thread-safe: the benchmark thread records results while request threads
+    look up the fastest model.
+    """
+
+    def __init__(self, path: str = LEADERBOARD_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._endpoints = self._load()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("endpoints", {})
+        except (json.JSONDecodeError, IOError, AttributeError) as e:
+            print(
+                f"{Colors.YELLOW}Warning: Could not read {self.path}. Models will be benchmarked again. Error: {e}{Colors.RESET}"
+            )
+            return {}
+
+    def save(self):
+        """Writes the leaderboard atomically."""
+        with self._lock:
+            data = {"endpoints": self._endpoints}
+            temp_path = f"{self.path}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4)
+                os.replace(temp_path, self.path)
+            except (IOError, OSError) as e:
+                print(f"{Colors.RED}Error: Could not write {self.path}. Error: {e}{Colors.RESET}")
+
+    def record(self, endpoint: str, model: str, ttft, total: float, samples: list):
+        """
+        Stores the result of benchmarking one model.
+
+        Args:
+            endpoint: The LLM server's base URL.
+            model: The model ID.
+            ttft: Seconds until the first token arrived, or None if no text came back.
+            total: Seconds until the answer was complete.
+            samples: The raw answers. The model passes only if every one of
+                them passes the quality check.
+        """
+        failures = [sample for sample in samples if not passes_quality_check(sample)]
+        with self._lock:
+            self._endpoints.setdefault(endpoint, {})[model] = {
+                "ttft": ttft,
+                "total": total,
+                "passed": not failures,
+                # Keep a failing answer if there is one, since that explains the verdict.
+                "sample": failures[0] if failures else samples[0],
+                "updated": datetime.now().isoformat(),
+            }
+
+    def record_failure(self, endpoint: str, model: str, error: str):
+        """Marks a model that could not be benchmarked, so it is not chosen."""
+        with self._lock:
+            self._endpoints.setdefault(endpoint, {})[model] = {
+                "ttft": None,
+                "total": None,
+                "passed": False,
+                "error": error,
+                "updated": datetime.now().isoformat(),
+            }
+
+    def fastest_model(self, endpoint: str, available: list):
+        """
+        Picks the model with the lowest total latency that passed the quality check.
+
+        Only models the server currently lists are considered, and time to
+        first token breaks ties.
+
+        Returns:
+            The model ID, or None if no listed model has passed a benchmark yet.
+        """
+        with self._lock:
+            results = self._endpoints.get(endpoint, {})
+            passed = [
+                (result["total"], result["ttft"] or 0.0, model)
+                for model, result in results.items()
+                if model in available and result.get("passed")
+            ]
+        return min(passed)[2] if passed else None
+
+    def standings(self, endpoint: str) -> list:
+        """Returns (model, result) pairs for an endpoint, fastest passing model first."""
+        with self._lock:
+            results = dict(self._endpoints.get(endpoint, {}))
+        return sorted(
+            results.items(),
+            key=lambda item: (not item[1].get("passed"), item[1].get("total") or float("inf")),
+        )
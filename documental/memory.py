@@ -9,15 +9,54 @@ generate more context-aware and personalized snark over time.
 
 import json
 import os
+import shutil
+import tempfile
+import time
 from datetime import datetime
 
-from .const import Colors
+from .const import (
+    BURST_THRESHOLD,
+    LATE_NIGHT_END_HOUR,
+    LATE_NIGHT_START_HOUR,
+    USAGE_WINDOWS,
+    Colors,
+)
+from .counters import RollingCounter
+from .similarity import DocumentIndex, canonicalize_document_name
 from .utils import ordinal
 
 # Define the absolute path to the memory file, ensuring it's always located
 # in the project root, regardless of where the script is run from.
 MEMORY_FILE_PATH = os.path.join(os.getcwd(), "memory.json")
 
+# The near-duplicate index is derived from `memory["families"]`, so it is not
+# saved to disk. It is rebuilt whenever a different memory dictionary is used.
+_document_index = None
+_document_index_source = None
+
+
+def use_scratch_memory() -> str:
+    """
+    Points the memory at a temporary copy of `memory.json`.
+
+    Replays and synthetic runs start from what the agent really remembers, but
+    their made-up traffic must never end up in the persistent memory. The
+    caller removes the copy when the run is over.
+
+    Returns:
+        The path of the temporary memory file.
+    """
+    global MEMORY_FILE_PATH
+    handle, scratch_path = tempfile.mkstemp(prefix="documental-memory-", suffix=".json")
+    os.close(handle)
+    if os.path.exists(MEMORY_FILE_PATH):
+        shutil.copyfile(MEMORY_FILE_PATH, scratch_path)
+    else:
+        # An empty file would be read as corrupted, so let load_memory create a fresh one.
+        os.remove(scratch_path)
+    MEMORY_FILE_PATH = scratch_path
+    return scratch_path
+
 
 def load_memory() -> dict:
     """
@@ -33,35 +72,41 @@ def load_memory() -> dict:
         print(
             f"{Colors.YELLOW}Memory file not found. Creating a new one at {MEMORY_FILE_PATH}.{Colors.RESET}"
         )
-        default_memory = {"users": {}, "documents": {}}
+        default_memory = {"users": {}, "documents": {}, "families": {}}
         save_memory(default_memory)
         return default_memory
     try:
         with open(MEMORY_FILE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+            memory = json.load(f)
+        # Memory files written before document families existed lack this key.
+        memory.setdefault("families", {})
+        return memory
     except (json.JSONDecodeError, IOError) as e:
         print(
             f"{Colors.YELLOW}Warning: Could not read or parse memory.json. Starting with a fresh memory. Error: {e}{Colors.RESET}"
         )
-        return {"users": {}, "documents": {}}
+        return {"users": {}, "documents": {}, "families": {}}
 
 
 def save_memory(data: dict):
     """
     Saves the provided memory dictionary to the `memory.json` file.
 
-    The data is written in a pretty-printed JSON format (with indentation)
-    to make it human-readable for debugging or manual inspection.
+    The file is rewritten after every job, so it is written compactly on a
+    single line. Use `python -m json.tool memory.json` to inspect it.
 
     Args:
         data: The dictionary containing the memory data to be saved.
     """
     print(f"{Colors.YELLOW}--- Attempting to save memory ---")
     print(f"Target file path: {MEMORY_FILE_PATH}")
-    print(f"Data to save: {data}")
+    print(
+        f"Data to save: {len(data.get('users', {}))} users, {len(data.get('documents', {}))} documents, "
+        f"{len(data.get('families', {}))} families"
+    )
     try:
         with open(MEMORY_FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+            json.dump(data, f, separators=(",", ":"))
         print(f"{Colors.GREEN}--- Memory saved successfully ---")
     except IOError as e:
         print(f"--- CRITICAL: FAILED TO SAVE MEMORY ---")
@@ -70,6 +115,159 @@ def save_memory(data: dict):
         print(f"--- END OF ERROR ---")
 
 
+def _event_timestamp(job_info: dict) -> float:
+    """Returns the job's submission time as a Unix timestamp, falling back to now."""
+    submitted = job_info.get("Submitted")
+    if isinstance(submitted, datetime):
+        return submitted.timestamp()
+    return time.time()
+
+
+def _is_late_night(timestamp: float) -> bool:
+    """Checks whether a timestamp falls within the configured late-night hours (local time)."""
+    hour = datetime.fromtimestamp(timestamp).hour
+    return hour >= LATE_NIGHT_START_HOUR or hour < LATE_NIGHT_END_HOUR
+
+
+# The rolling windows kept for each kind of memory entry. Only windows that are
+# read are stored: bursts are a user habit, reprints a document (or family) one.
+USER_WINDOWS = ("minute", "hour")
+DOCUMENT_WINDOWS = ("day",)
+
+
+def _load_windows(entry: dict, names: tuple) -> dict:
+    """Restores the named rolling usage counters stored on a memory entry."""
+    stored = entry.get("windows", {})
+    return {
+        name: RollingCounter.from_list(stored.get(name), *USAGE_WINDOWS[name])
+        for name in names
+    }
+
+
+def _record_usage(entry: dict, timestamp: float, names: tuple, late_night: bool = False):
+    """
+    Counts one print in each of the named rolling usage windows of an entry.
+
+    This is a constant-time operation. The counters are written back in their
+    compact list form so they serialize directly into `memory.json`, and
+    windows the entry does not use are dropped.
+    """
+    windows = _load_windows(entry, names)
+    for counter in windows.values():
+        counter.add(timestamp)
+    entry["windows"] = {name: counter.to_list() for name, counter in windows.items()}
+
+    if late_night:
+        late_counter = RollingCounter.from_list(
+            entry.get("late_night"), *USAGE_WINDOWS["day"]
+        )
+        late_counter.add(timestamp)
+        entry["late_night"] = late_counter.to_list()
+
+
+def _get_usage_context(
+    user_name: str, user_memory, doc_name: str, doc_memory, timestamp: float
+) -> list:
+    """
+    Describes recent bursts, late-night habits and same-day reprints.
+
+    Only the fixed-size rolling counters are read, so this never scans history.
+    """
+    context_parts = []
+
+    if user_memory:
+        user_windows = _load_windows(user_memory, USER_WINDOWS)
+        last_minute = user_windows["minute"].total(timestamp)
+        last_hour = user_windows["hour"].total(timestamp)
+        if last_minute >= BURST_THRESHOLD:
+            context_parts.append(
+                f"'{user_name}' has sent {last_minute} jobs in the last minute, a printing burst."
+            )
+        elif last_hour > 1:
+            context_parts.append(
+                f"'{user_name}' has printed {last_hour} times in the last hour."
+            )
+
+        if _is_late_night(timestamp):
+            late_count = RollingCounter.from_list(
+                user_memory.get("late_night"), *USAGE_WINDOWS["day"]
+            ).total(timestamp)
+            clock = datetime.fromtimestamp(timestamp).strftime("%H:%M")
+            if late_count:
+                context_parts.append(
+                    f"It is {clock}, late at night. This is the {ordinal(late_count)} late-night print from '{user_name}' in the last 24 hours."
+                )
+
+    if doc_memory:
+        today = _load_windows(doc_memory, DOCUMENT_WINDOWS)["day"].total(timestamp)
+        if today > 1:
+            context_parts.append(
+                f"This is the {ordinal(today - 1)} reprint of '{doc_name}' in the last 24 hours."
+            )
+
+    return context_parts
+
+
+def _get_document_index(memory: dict) -> DocumentIndex:
+    """Returns the near-duplicate index for this memory, building it on first use."""
+    global _document_index, _document_index_source
+    families = memory.setdefault("families", {})
+    if _document_index is None or _document_index_source is not families:
+        _document_index = DocumentIndex()
+        for family_id, family in families.items():
+            for canonical in family.get("names", []):
+                _document_index.add(canonical, family_id)
+        _document_index_source = families
+    return _document_index
+
+
+def _update_family(memory: dict, doc_name: str, doc_memory: dict, timestamp: float) -> dict:
+    """
+    Counts a print against the document's family, creating the family if needed.
+
+    The family is looked up once per document name and then remembered on the
+    document's own memory entry.
+    """
+    families = memory.setdefault("families", {})
+    family_id = doc_memory.get("family")
+    if family_id not in families:
+        index = _get_document_index(memory)
+        canonical = canonicalize_document_name(doc_name)
+        family_id = index.find(canonical)
+        if family_id is None:
+            family_id = str(len(families) + 1)
+            families[family_id] = {"names": [], "document_count": 0, "print_count": 0}
+        family = families[family_id]
+        if canonical not in family["names"]:
+            family["names"].append(canonical)
+            index.add(canonical, family_id)
+        family["document_count"] += 1
+        doc_memory["family"] = family_id
+
+    family = families[family_id]
+    family["print_count"] += 1
+    _record_usage(family, timestamp, DOCUMENT_WINDOWS)
+    return family
+
+
+def _get_family_context(doc_name: str, doc_memory, family, timestamp: float) -> list:
+    """Describes reprints of other versions of the same document."""
+    if not family or family["document_count"] < 2:
+        return []
+    if family["print_count"] <= doc_memory["print_count"]:
+        return []
+    context_parts = [
+        f"'{doc_name}' is one of {family['document_count']} versions of the same document, "
+        f"which have been printed {family['print_count']} times in total."
+    ]
+    today = _load_windows(family, DOCUMENT_WINDOWS)["day"].total(timestamp)
+    if today > 1:
+        context_parts.append(
+            f"This is the {ordinal(today - 1)} reprint of some version of it in the last 24 hours."
+        )
+    return context_parts
+
+
 def update_and_get_context(job_info: dict, memory: dict) -> tuple[str, dict]:
     """
     Updates the memory with details from a new print job and generates a historical context string.
@@ -89,12 +287,15 @@ def update_and_get_context(job_info: dict, memory: dict) -> tuple[str, dict]:
     """
     user_name = job_info.get("pUserName", "N/A")
     doc_name = job_info.get("pDocument", "N/A")
+    timestamp = _event_timestamp(job_info)
     context_parts = []
+    user_memory = doc_memory = family = None
 
     if user_name != "N/A":
         user_memory = memory["users"].get(user_name, {"print_count": 0})
         user_memory["print_count"] += 1
         user_memory["last_print_timestamp"] = datetime.now().isoformat()
+        _record_usage(user_memory, timestamp, USER_WINDOWS, late_night=_is_late_night(timestamp))
         memory["users"][user_name] = user_memory
         context_parts.append(
             f"This is the {ordinal(user_memory['print_count'])} time '{user_name}' has printed."
@@ -104,12 +305,19 @@ def update_and_get_context(job_info: dict, memory: dict) -> tuple[str, dict]:
         doc_memory = memory["documents"].get(doc_name, {"print_count": 0})
         doc_memory["print_count"] += 1
         doc_memory["last_print_timestamp"] = datetime.now().isoformat()
+        _record_usage(doc_memory, timestamp, DOCUMENT_WINDOWS)
+        family = _update_family(memory, doc_name, doc_memory, timestamp)
         memory["documents"][doc_name] = doc_memory
         if doc_memory["print_count"] > 1:
             context_parts.append(
                 f"The document '{doc_name}' has been printed {doc_memory['print_count']} times before."
             )
 
+    context_parts.extend(
+        _get_usage_context(user_name, user_memory, doc_name, doc_memory, timestamp)
+    )
+    context_parts.extend(_get_family_context(doc_name, doc_memory, family, timestamp))
+
     save_memory(memory)
 
     return " ".join(context_parts), memory
@@ -131,7 +339,9 @@ def get_context_without_updating(job_info: dict, memory: dict) -> str:
     """
     user_name = job_info.get("pUserName", "N/A")
     doc_name = job_info.get("pDocument", "N/A")
+    timestamp = _event_timestamp(job_info)
     context_parts = []
+    user_memory = doc_memory = family = None
 
     if user_name != "N/A" and user_name in memory["users"]:
         user_memory = memory["users"][user_name]
@@ -141,9 +351,15 @@ def get_context_without_updating(job_info: dict, memory: dict) -> str:
 
     if doc_name != "N/A" and doc_name in memory["documents"]:
         doc_memory = memory["documents"][doc_name]
+        family = memory.get("families", {}).get(doc_memory.get("family"))
         if doc_memory["print_count"] > 0:
             context_parts.append(
                 f"The document '{doc_name}' has been printed {doc_memory['print_count']} times before."
             )
 
+    context_parts.extend(
+        _get_usage_context(user_name, user_memory, doc_name, doc_memory, timestamp)
+    )
+    context_parts.extend(_get_family_context(doc_name, doc_memory, family, timestamp))
+
     return " ".join(context_parts)
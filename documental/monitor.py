@@ -7,12 +7,28 @@ in pywin32 to achieve an efficient, event-driven monitoring of the printer queue
 """
 
 import ctypes
+import time
 from ctypes import wintypes
 
 import pywintypes
 import win32print
 
-from .const import Colors
+from .const import (
+    ERROR_STATUS_MASK,
+    JOB_STATUS_BLOCKED_DEVQ,
+    JOB_STATUS_ERROR,
+    JOB_STATUS_OFFLINE,
+    JOB_STATUS_PAPEROUT,
+    JOB_STATUS_PAUSED,
+    JOB_STATUS_PRINTED,
+    JOB_STATUS_SPOOLING,
+    JOB_STATUS_USER_INTERVENTION,
+    WATCHER_STOP_CHECK_MS,
+    Colors,
+)
+from .polling import AdaptiveInterval, polling_budget
+from .profiling import timed
+from .settings import get_settings
 from .utils import get_available_printers, get_job_status_string
 
 # --- ctypes Setup for Windows API Calls ---
@@ -24,9 +40,23 @@ kernel32 = ctypes.WinDLL("kernel32.dll", use_last_error=True)
 PRINTER_CHANGE_ADD_JOB = 0x00000100
 PRINTER_CHANGE_SET_JOB = 0x00000200
 PRINTER_CHANGE_DELETE_JOB = 0x00000400
-# Note: INVALID_HANDLE_VALUE is the integer value, not a ctypes object.
-INVALID_HANDLE_VALUE = -1
+# (HANDLE)-1 as ctypes returns it for a HANDLE (c_void_p) restype, i.e.
+# 0xFFFFFFFFFFFFFFFF on 64-bit Python rather than the integer -1.
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
 INFINITE = 0xFFFFFFFF
+WAIT_TIMEOUT = 0x00000102
+
+# Status transitions worth reporting. Anything else (e.g. plain "printing") is ignored.
+STATUSES_TO_REPORT = (
+    JOB_STATUS_PAUSED
+    | JOB_STATUS_ERROR
+    | JOB_STATUS_OFFLINE
+    | JOB_STATUS_PAPEROUT
+    | JOB_STATUS_USER_INTERVENTION
+    | JOB_STATUS_BLOCKED_DEVQ
+    | JOB_STATUS_SPOOLING
+    | JOB_STATUS_PRINTED
+)
 
 # --- ctypes Function Prototypes ---
 # Define the argument types and return types for the Win32 functions we need.
@@ -42,7 +72,8 @@ winspool.FindFirstPrinterChangeNotification.argtypes = [
     wintypes.DWORD,
     wintypes.LPVOID,
 ]
-# The return type is a handle, which ctypes treats as an integer.
+# The return type is a handle, which ctypes returns as an unsigned integer,
+# or as None for a NULL handle.
 winspool.FindFirstPrinterChangeNotification.restype = wintypes.HANDLE
 
 winspool.FindNextPrinterChangeNotification.argtypes = [
@@ -60,10 +91,167 @@ kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
 kernel32.WaitForSingleObject.restype = wintypes.DWORD
 
 
-def watch_printer_queue(printer_name: str):
-    """Monitors a printer queue using a ctypes bridge to the Win32 API."""
+class StatusDebouncer:
+    """
+    Holds back rapid status changes so each job reports at most once per window.
+
+    The first status change for a job opens a window. Later changes within that
+    window replace the held event, and when the window closes only the latest
+    (final) state is emitted. Error-class statuses are never held back.
+
+    The window is either a number of seconds or a callable returning one,
+    which lets it follow configuration reloads.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        # Maps job ID -> (deadline, latest held event).
+        self.pending = {}
+
+    def offer(self, event: dict, now: float) -> list:
+        """Accepts a `status_change` event and returns the events to emit right away."""
+        job_id = event["job_info"]["JobId"]
+        window = self.window() if callable(self.window) else self.window
+        if window <= 0 or event["job_info"]["Status"] & ERROR_STATUS_MASK:
+            # Whatever was pending is superseded by the more urgent state.
+            self.pending.pop(job_id, None)
+            return [event]
+        deadline = self.pending.get(job_id, (now + window, None))[0]
+        self.pending[job_id] = (deadline, event)
+        return []
+
+    def discard(self, job_id):
+        """Drops any held status for a job, e.g. because it has left the queue."""
+        self.pending.pop(job_id, None)
+
+    def due(self, now: float) -> list:
+        """Returns, and stops holding, the events whose window has closed."""
+        ready = [job_id for job_id, (deadline, _) in self.pending.items() if deadline <= now]
+        return [self.pending.pop(job_id)[1] for job_id in ready]
+
+    def wait_timeout_ms(self, now: float) -> int:
+        """How long the monitor may block before the next held event is due."""
+        if not self.pending:
+            return INFINITE
+        next_deadline = min(deadline for deadline, _ in self.pending.values())
+        return max(0, int((next_deadline - now) * 1000))
+
+
+def diff_jobs(last_jobs: dict, current_jobs: dict):
+    """Compares two job tables and yields the `new_job`, `status_change` and `job_deleted` events."""
+    for job_id, job in current_jobs.items():
+        if job_id not in last_jobs:
+            yield {"event": "new_job", "job_info": job}
+        elif job["Status"] != last_jobs[job_id].get("Status"):
+            if job["Status"] & STATUSES_TO_REPORT:
+                yield {"event": "status_change", "job_info": job}
+
+    for job_id, job in last_jobs.items():
+        if job_id not in current_jobs:
+            yield {"event": "job_deleted", "job_info": job}
+
+
+def _apply_changes(last_jobs: dict, current_jobs: dict, debouncer):
+    """Yields the events between two job tables, passing status changes through the debouncer."""
+    now = time.monotonic()
+    with timed("monitor_diff"):
+        events = list(diff_jobs(last_jobs, current_jobs))
+    for event in events:
+        if event["event"] == "status_change":
+            yield from debouncer.offer(event, now)
+        else:
+            if event["event"] == "job_deleted":
+                # The deletion is the job's final state; a held status is moot.
+                debouncer.discard(event["job_info"]["JobId"])
+            yield event
+
+
+def _fingerprint(jobs) -> tuple:
+    """Summarizes enumerated jobs by the fields that change with any queue activity."""
+    return tuple((job["JobId"], job["Status"], job["PagesPrinted"]) for job in jobs)
+
+
+def _job_fingerprint(printer_handle) -> tuple:
+    """
+    Cheaply summarizes the queue using a level 1 enumeration.
+
+    Level 1 omits the DEVMODE and other bulky fields of level 2, but still
+    changes whenever a job is added, removed, changes status or makes progress.
+    """
+    return _fingerprint(win32print.EnumJobs(printer_handle.value, 0, -1, 1))
+
+
+def _poll_printer_queue(printer_handle, last_jobs: dict, debouncer, stop_event):
+    """
+    Watches a queue by polling, for printers that don't support change notifications.
+
+    Each poll first compares a cheap fingerprint of the queue, and only does a
+    full enumeration when it changed. The interval shrinks while the queue is
+    busy, backs off while it is idle, and is stretched further by the shared
+    polling budget when many queues are being polled at once.
+    """
+    interval = AdaptiveInterval()
+    # Start from the snapshot the caller already compared against, so a job
+    # that arrived since it was taken still counts as a change.
+    fingerprint = _fingerprint(last_jobs.values())
+    next_poll = time.monotonic() + interval.current
+    polling_budget.register()
+    try:
+        while True:
+            now = time.monotonic()
+            wake_at = min(next_poll, now + debouncer.wait_timeout_ms(now) / 1000)
+            delay = max(0.0, wake_at - now)
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return
+            else:
+                time.sleep(delay)
+
+            if time.monotonic() >= next_poll:
+                cpu_start = time.thread_time()
+                current_fingerprint = _job_fingerprint(printer_handle)
+                activity = current_fingerprint != fingerprint
+                if activity:
+                    fingerprint = current_fingerprint
+                    current_jobs_info = win32print.EnumJobs(printer_handle.value, 0, -1, 2)
+                    current_jobs = {job["JobId"]: job for job in current_jobs_info}
+                    yield from _apply_changes(last_jobs, current_jobs, debouncer)
+                    last_jobs = current_jobs
+                polling_budget.record(time.thread_time() - cpu_start)
+                next_poll = time.monotonic() + max(
+                    interval.next(activity), polling_budget.min_interval()
+                )
+
+            yield from debouncer.due(time.monotonic())
+    finally:
+        polling_budget.unregister()
+
+
+def watch_printer_queue(
+    printer_name: str,
+    debounce_seconds: float = None,
+    stop_event=None,
+    checkpoint=None,
+):
+    """
+    Monitors a printer queue using a ctypes bridge to the Win32 API.
+
+    Status changes are debounced per job over `debounce_seconds` so that a job
+    going through spooling, printing and printed only produces one event. By
+    default the window follows `monitor.debounce_seconds` in the live settings.
+    If a `threading.Event` is given as `stop_event`, monitoring ends cleanly
+    shortly after it is set. If a `CheckpointStore` is given, its saved job
+    table is used as the starting point, so changes that happened while the
+    agent was down are still reported. Keeping the saved table up to date is
+    left to whoever handles the events (see `CheckpointStore.record_event`).
+    """
     change_handle = None
     printer_handle = None
+    debouncer = StatusDebouncer(
+        debounce_seconds
+        if debounce_seconds is not None
+        else lambda: get_settings().debounce_seconds
+    )
     try:
         # --- Open Printer Handle via ctypes ---
         printer_handle = wintypes.HANDLE()
@@ -81,56 +269,62 @@ def watch_printer_queue(printer_name: str):
             printer_handle, flags, 0, None
         )
 
-        if change_handle == INVALID_HANDLE_VALUE:
-            raise ctypes.WinError(ctypes.get_last_error())
-
-        print("Subscribed to printer change notifications. Waiting for events...")
+        if change_handle in (None, 0, INVALID_HANDLE_VALUE):
+            # Some network printers and drivers don't support notifications.
+            # Rather than giving up on the printer, fall back to polling it.
+            error = ctypes.WinError(ctypes.get_last_error())
+            change_handle = None
+            print(
+                f"{Colors.YELLOW}Change notifications unavailable for '{printer_name}' ({error}). "
+                f"Falling back to adaptive polling.{Colors.RESET}"
+            )
+        else:
+            print("Subscribed to printer change notifications. Waiting for events...")
 
         # --- Initial State Snapshot ---
         initial_jobs_info = win32print.EnumJobs(printer_handle.value, 0, -1, 2)
-        last_jobs = {job["JobId"]: job for job in initial_jobs_info}
-        print(f"Found {len(last_jobs)} existing jobs in the queue.")
+        initial_jobs = {job["JobId"]: job for job in initial_jobs_info}
+        print(f"Found {len(initial_jobs)} existing jobs in the queue.")
+
+        # --- Reconcile Against the Last Checkpoint ---
+        saved_jobs = checkpoint.get_jobs(printer_name) if checkpoint else None
+        if saved_jobs is not None:
+            print(
+                f"Reconciling {len(saved_jobs)} checkpointed jobs on '{printer_name}' with the live queue."
+            )
+            yield from _apply_changes(saved_jobs, initial_jobs, debouncer)
+        elif checkpoint:
+            # The first run starts from the queue as it is, like without a checkpoint.
+            checkpoint.update_jobs(printer_name, initial_jobs)
+        last_jobs = initial_jobs
+
+        if change_handle is None:
+            yield from _poll_printer_queue(printer_handle, last_jobs, debouncer, stop_event)
+            return
 
         # --- Main Monitoring Loop ---
         while True:
-            kernel32.WaitForSingleObject(change_handle, INFINITE)
+            # Block until the spooler signals a change, or until a held status is due.
+            timeout_ms = debouncer.wait_timeout_ms(time.monotonic())
+            if stop_event is not None:
+                timeout_ms = min(timeout_ms, WATCHER_STOP_CHECK_MS)
+            wait_result = kernel32.WaitForSingleObject(change_handle, timeout_ms)
 
-            pdw_change = wintypes.DWORD()
-            winspool.FindNextPrinterChangeNotification(
-                change_handle, ctypes.byref(pdw_change), None, None
-            )
-            # print(
-            #     f"{Colors.CYAN}Change detected on '{printer_name}'. Checking for jobs...{Colors.RESET}"
-            # )
-
-            current_jobs_info = win32print.EnumJobs(printer_handle.value, 0, -1, 2)
-            current_jobs = {job["JobId"]: job for job in current_jobs_info}
-
-            for job_id, job in current_jobs.items():
-                if job_id not in last_jobs:
-                    yield {"event": "new_job", "job_info": job}
-                elif job["Status"] != last_jobs.get(job_id, {}).get("Status"):
-                    statuses_to_report = {
-                        win32print.JOB_STATUS_PAUSED,
-                        win32print.JOB_STATUS_ERROR,
-                        win32print.JOB_STATUS_OFFLINE,
-                        win32print.JOB_STATUS_PAPEROUT,
-                        win32print.JOB_STATUS_USER_INTERVENTION,
-                        win32print.JOB_STATUS_BLOCKED_DEVQ,
-                        win32print.JOB_STATUS_SPOOLING,
-                        win32print.JOB_STATUS_PRINTED,
-                    }
-                    if any(job["Status"] & status for status in statuses_to_report):
-                        yield {"event": "status_change", "job_info": job}
-
-            for job_id in list(last_jobs.keys()):
-                if job_id not in current_jobs:
-                    yield {
-                        "event": "job_deleted",
-                        "job_info": last_jobs[job_id],
-                    }
-
-            last_jobs = current_jobs
+            if stop_event is not None and stop_event.is_set():
+                return
+
+            if wait_result != WAIT_TIMEOUT:
+                pdw_change = wintypes.DWORD()
+                winspool.FindNextPrinterChangeNotification(
+                    change_handle, ctypes.byref(pdw_change), None, None
+                )
+
+                current_jobs_info = win32print.EnumJobs(printer_handle.value, 0, -1, 2)
+                current_jobs = {job["JobId"]: job for job in current_jobs_info}
+                yield from _apply_changes(last_jobs, current_jobs, debouncer)
+                last_jobs = current_jobs
+
+            yield from debouncer.due(time.monotonic())
 
     except Exception as e:
         yield f"{Colors.RED}An error occurred in the monitor thread: {e}{Colors.RESET}"
@@ -138,7 +332,7 @@ def watch_printer_queue(printer_name: str):
     finally:
         # --- Graceful Shutdown ---
         print(f"Shutting down monitoring for {printer_name}.")
-        if change_handle and change_handle != INVALID_HANDLE_VALUE:
+        if change_handle not in (None, 0, INVALID_HANDLE_VALUE):
             winspool.FindClosePrinterChangeNotification(change_handle)
         if printer_handle and printer_handle.value:
             winspool.ClosePrinter(printer_handle)
@@ -0,0 +1,123 @@
+"""
+The Pipeline Module: The Conveyor Belt
+
+This module provides the asyncio runtime that the orchestrator runs on.
+Events from the monitor threads, the hub or a replay arrive through a
+`ThreadBridge`, which hands them to the event loop the moment they are put,
+so the orchestrator awaits events instead of polling for them.
+
+The work itself is blocking: memory is a JSON file, the LLM client is
+`requests`, and notifications and speech are synchronous libraries. Each kind
+of work therefore runs as a stage on its own thread pool, awaited from the
+loop. The memory and notification stages have a single worker each, so
+memory updates happen in event order and the speech engine is never used
+from two threads at once. The LLM stage has one worker per allowed in-flight
+event, so many slow generations can overlap while the loop stays free.
+
+All in-flight work is tracked, so shutting down either lets it finish
+(`drain`) or cancels it (`close`), and nothing is left running behind the
+orchestrator's back.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .const import PIPELINE_MAX_IN_FLIGHT, Colors
+from .profiling import profile_worker_thread
+
+
+class ThreadBridge:
+    """
+    Carries events from worker threads into the event loop.
+
+    It offers the `put` method of `queue.Queue`, so the monitor workers, the
+    hub and the replay thread can feed it without knowing about asyncio.
+    It must be created while `loop` is the current event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def put(self, item):
+        """Queues an item from any thread."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def get(self, timeout: float = None):
+        """
+        Waits for the next item.
+
+        Raises:
+            asyncio.TimeoutError: If `timeout` seconds pass without an item.
+        """
+        if timeout is None:
+            return await self._queue.get()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class Pipeline:
+    """
+    Runs blocking stages on dedicated thread pools and tracks in-flight work.
+
+    Args:
+        max_in_flight: How many events may be between intake and delivery at once.
+            Intake waits when the limit is reached, so a flood of events cannot
+            pile up an unbounded number of pending LLM calls.
+    """
+
+    def __init__(self, max_in_flight: int = PIPELINE_MAX_IN_FLIGHT):
+        self._executors = {
+            "memory": ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="documental-memory", initializer=profile_worker_thread
+            ),
+            "llm": ThreadPoolExecutor(
+                max_workers=max_in_flight, thread_name_prefix="documental-llm", initializer=profile_worker_thread
+            ),
+            "notify": ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="documental-notify", initializer=profile_worker_thread
+            ),
+        }
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+
+    async def run_stage(self, stage: str, fn, *args):
+        """Runs a blocking function on the stage's thread pool and returns its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[stage], fn, *args)
+
+    async def spawn(self, coro):
+        """
+        Starts a coroutine as tracked in-flight work, waiting for a free slot first.
+
+        Errors are reported when the task finishes, so one failed event never
+        takes the orchestrator down.
+        """
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            coro.close()
+            raise
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception():
+            print(f"{Colors.RED}Error while delivering an event: {task.exception()}{Colors.RESET}")
+
+    async def drain(self):
+        """Waits for all in-flight work to finish."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self):
+        """Cancels any remaining work and releases the thread pools."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for executor in self._executors.values():
+            # A worker stuck in a blocking call can't be interrupted, so don't wait for it.
+            executor.shutdown(wait=False)
@@ -0,0 +1,75 @@
+"""
+The Polling Module: The Night Watchman
+
+Some network printers and driver combinations refuse to send change
+notifications, so their queues have to be polled instead. This module decides
+how often. Each queue polls quickly while it is busy and backs off
+exponentially while it is idle, and a shared budget stretches every interval
+when there are so many polled queues that polling would exceed its CPU target.
+"""
+
+import threading
+
+from .const import (
+    POLL_BACKOFF_FACTOR,
+    POLL_CPU_BUDGET,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+)
+
+
+class AdaptiveInterval:
+    """The poll interval of a single queue: short while busy, growing while idle."""
+
+    def __init__(self):
+        self.current = POLL_MIN_INTERVAL
+
+    def next(self, activity: bool) -> float:
+        """Updates the interval after a poll and returns it."""
+        if activity:
+            self.current = POLL_MIN_INTERVAL
+        else:
+            self.current = min(self.current * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL)
+        return self.current
+
+
+class PollingBudget:
+    """
+    Keeps the combined CPU cost of all polled queues within a target.
+
+    Every poll reports how much CPU time it used. From the average cost and
+    the number of polling queues, the budget derives the shortest interval
+    any queue may use so that, together, they stay within `cpu_fraction` of
+    one core.
+    """
+
+    def __init__(self, cpu_fraction: float = POLL_CPU_BUDGET):
+        self.cpu_fraction = cpu_fraction
+        self.pollers = 0
+        self.average_cost = 0.0
+        self._lock = threading.Lock()
+
+    def register(self):
+        with self._lock:
+            self.pollers += 1
+
+    def unregister(self):
+        with self._lock:
+            self.pollers -= 1
+
+    def record(self, cost: float):
+        """Folds the CPU seconds spent by one poll into the running average."""
+        with self._lock:
+            if self.average_cost:
+                self.average_cost = 0.9 * self.average_cost + 0.1 * cost
+            else:
+                self.average_cost = cost
+
+    def min_interval(self) -> float:
+        """The shortest poll interval that keeps all pollers within the budget."""
+        with self._lock:
+            return self.average_cost * self.pollers / self.cpu_fraction
+
+
+# Shared by every polled queue in this process.
+polling_budget = PollingBudget()
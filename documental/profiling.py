@@ -0,0 +1,264 @@
+"""
+The Profiling Module: The Stopwatch
+
+When the agent feels sluggish, this module finds out why. In profile mode
+(`documental --profile`), the pipeline runs as usual while three things are
+measured:
+
+* Wall-clock time spent in each pipeline stage (monitor diff, memory update,
+  formatting, LLM and notification), collected by wrapping the stages in
+  `timed()`. Outside of profile mode `timed()` does nothing.
+* Where the CPU goes. cProfile traces the orchestrator and the pipeline's
+  worker threads, and a sampler thread periodically records the stack of
+  every thread and writes them as folded stacks, which flamegraph.pl,
+  speedscope and similar tools read.
+* Where the memory goes, using tracemalloc.
+
+Everything is written out when the agent exits. A synthetic event stream is
+available too, so a run can be repeated without any printers or recordings.
+"""
+
+import contextlib
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+from .const import (
+    JOB_STATUS_ERROR,
+    JOB_STATUS_PAPEROUT,
+    JOB_STATUS_PRINTING,
+    JOB_STATUS_SPOOLING,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_TOP_ALLOCATIONS,
+    PROFILE_TRACEMALLOC_FRAMES,
+    Colors,
+)
+from .replay import REPLAY_FINISHED
+
+# The active profiler, or None when not profiling.
+_active = None
+
+
+def profile_worker_thread():
+    """
+    Thread pool initializer that lets the active profiler trace the new worker.
+
+    Pass it as `initializer` to any executor whose work should show up in the
+    cProfile trace. Outside of profile mode it does nothing.
+    """
+    if _active is not None:
+        _active.trace_current_thread()
+
+
+def timed(stage: str):
+    """A context manager that adds the time spent inside it to a pipeline stage."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(stage)
+
+
+class _StageTiming:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+
+
+class PipelineProfiler:
+    """
+    Collects stage timings, a cProfile trace, stack samples and allocations.
+
+    Args:
+        output_prefix: Path prefix for the files written by `stop()`.
+        sample_interval: Seconds between stack samples.
+    """
+
+    def __init__(self, output_prefix: str, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.output_prefix = output_prefix
+        self.sample_interval = sample_interval
+        self.stages = {}
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._profile = cProfile.Profile()
+        # One profile per worker thread, merged into the main one by `stop()`.
+        self._thread_profiles = []
+        self._started = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                timing = self.stages.get(name)
+                if timing is None:
+                    timing = self.stages[name] = _StageTiming()
+                timing.count += 1
+                timing.total += elapsed
+                timing.longest = max(timing.longest, elapsed)
+
+    def _sample(self):
+        """Records the current stack of every thread except the sampler itself."""
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run_sampler(self):
+        while not self._stop_event.wait(self.sample_interval):
+            self._sample()
+
+    def trace_current_thread(self):
+        """
+        Adds the calling thread to the cProfile trace.
+
+        Before Python 3.12 a profile only sees the thread that enabled it, so
+        each worker gets its own. From 3.12 on, the main profile already
+        covers every thread and a second one could not be enabled.
+        """
+        if sys.version_info >= (3, 12):
+            return
+        profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        """Starts all measurements. cProfile traces the calling thread and registered workers."""
+        global _active
+        self._started = time.perf_counter()
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        self._sampler = threading.Thread(target=self._run_sampler, name="profiler", daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+        _active = self
+        print(f"{Colors.CYAN}Profiling enabled. Results go to {self.output_prefix}.*{Colors.RESET}")
+
+    def stop(self):
+        """Stops measuring and writes the results."""
+        global _active
+        _active = None
+        self._profile.disable()
+        self._stop_event.set()
+        self._sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        duration = time.perf_counter() - self._started
+
+        try:
+            stats = pstats.Stats(self._profile)
+            with self._lock:
+                for profile in self._thread_profiles:
+                    stats.add(profile)
+            stats.dump_stats(f"{self.output_prefix}.pstats")
+            self._write_folded(f"{self.output_prefix}.folded")
+            self._write_allocations(f"{self.output_prefix}.allocations.txt", snapshot)
+            with open(f"{self.output_prefix}.stages.txt", "w", encoding="utf-8") as f:
+                f.write(self.stage_report(duration) + "\n")
+        except IOError as e:
+            print(f"{Colors.RED}Could not write the profile to {self.output_prefix}.*: {e}{Colors.RESET}")
+            return
+
+        print(f"\n{Colors.BLUE}--- Profile ({duration:.1f}s) ---{Colors.RESET}")
+        print(self.stage_report(duration))
+        print(
+            f"{Colors.GREEN}Wrote {self.output_prefix}.pstats, .folded, .allocations.txt "
+            f"and .stages.txt{Colors.RESET}"
+        )
+
+    def stage_report(self, duration: float) -> str:
+        """
+        Formats the stage timings as a table, slowest stage first.
+
+        The share is the stage's total time relative to the run. Stages that run
+        concurrently, such as overlapping LLM calls, can exceed 100%.
+        """
+        lines = [f"{'Stage':<14}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}{'Max ms':>10}{'Share':>8}"]
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1].total, reverse=True)
+        for name, timing in stages:
+            lines.append(
+                f"{name:<14}{timing.count:>8}{timing.total:>10.3f}"
+                f"{1000 * timing.total / timing.count:>10.2f}{1000 * timing.longest:>10.2f}"
+                f"{timing.total / duration if duration else 0:>8.1%}"
+            )
+        return "\n".join(lines)
+
+    def _write_folded(self, path: str):
+        """Writes the stack samples in the folded format: `frame;frame;frame count`."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _write_allocations(self, path: str, snapshot):
+        """Writes the source lines holding the most memory at exit."""
+        statistics = snapshot.filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        ).statistics("lineno")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Top {PROFILE_TOP_ALLOCATIONS} allocations by size\n")
+            for stat in statistics[:PROFILE_TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                f.write(
+                    f"{stat.size / 1024:10.1f} KiB {stat.count:8} blocks  "
+                    f"{frame.filename}:{frame.lineno}\n"
+                )
+
+
+def synthetic_worker(event_queue, count: int, printers: list = None, seed: int = 0):
+    """
+    Feeds a reproducible stream of made-up print jobs into the queue as fast as possible.
+
+    Each job is submitted, changes status once, and then finishes.
+    Finally `(None, REPLAY_FINISHED)` is queued, just like at the end of a replay.
+
+    Args:
+        event_queue: The queue to feed.
+        count: The number of jobs to generate.
+        printers: The printer names to spread the jobs over.
+        seed: The random seed, so runs can be compared with each other.
+    """
+    rng = random.Random(seed)
+    printers = printers or ["Synthetic Printer"]
+    users = [f"user{n}" for n in range(20)]
+    documents = ["Quarterly Report", "invoice_2024", "Resume (final)", "cat.png", "Meeting Notes"]
+    submitted = datetime.now() - timedelta(hours=count // 60)
+
+    for job_id in range(1, count + 1):
+        submitted += timedelta(seconds=rng.randint(1, 120))
+        job = {
+            "JobId": job_id,
+            "pDocument": f"{rng.choice(documents)} {rng.randint(1, 3)}.docx",
+            "pUserName": rng.choice(users),
+            "Status": JOB_STATUS_SPOOLING,
+            "TotalPages": rng.randint(1, 40),
+            "Size": rng.randint(10_000, 5_000_000),
+            "Submitted": submitted,
+        }
+        printer_name = rng.choice(printers)
+        event_queue.put((printer_name, {"event": "new_job", "job_info": dict(job)}))
+        # Most jobs just print, but some get stuck so the high-priority path is exercised too.
+        status = rng.choice([JOB_STATUS_PRINTING] * 8 + [JOB_STATUS_ERROR, JOB_STATUS_PAPEROUT])
+        event_queue.put((printer_name, {"event": "status_change", "job_info": dict(job, Status=status)}))
+        event_queue.put((printer_name, {"event": "job_deleted", "job_info": dict(job, Status=status)}))
+
+    event_queue.put((None, REPLAY_FINISHED))
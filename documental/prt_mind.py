@@ -6,41 +6,95 @@ agent, discovers all available printers, and runs an infinite loop to listen
 for events, consult the brain, and broadcast the resulting snark to the user.
 """
 
+import argparse
+import asyncio
+import os
 import queue
+import socket
 import threading
 
-import pythoncom
-import win32print
-
-from .brain import get_llm_response
+from .brain import get_llm_response, start_model_benchmarks
+from .checkpoint import CheckpointStore
 from .communication import notify_user, speak_message
-from .const import PRE_DEFINED_PATTERNS, Colors
+from .digest import DigestScheduler
+from .const import (
+    JOB_STATUS_BLOCKED_DEVQ,
+    JOB_STATUS_ERROR,
+    JOB_STATUS_PAPEROUT,
+    JOB_STATUS_USER_INTERVENTION,
+    Colors,
+)
+from .history import HISTORY_DIR_PATH, open_history_writer
+from .hub import HubAgent, parse_address, start_hub
 from .memory import (
     get_context_without_updating,
     load_memory,
-    update_and_get_context
+    update_and_get_context,
+    use_scratch_memory,
     )
-from .monitor import watch_printer_queue
-from .utils import get_available_printers, get_job_status_string
-
-
-def printer_monitoring_worker(printer_name: str, event_queue: queue.Queue):
+from .pipeline import Pipeline, ThreadBridge
+from .profiling import PipelineProfiler, synthetic_worker, timed
+from .replay import REPLAY_FINISHED, EventRecorder, replay_worker
+from .report import add_report_arguments, run_report
+from .settings import get_settings, start_settings_watcher
+from .supervisor import PrinterSupervisor, WatcherHealth
+from .utils import get_job_status_string
+
+
+def printer_monitoring_worker(
+    printer_name: str,
+    event_queue: queue.Queue,
+    recorder: EventRecorder = None,
+    checkpoint: CheckpointStore = None,
+    stop_event: threading.Event = None,
+    health: WatcherHealth = None,
+):
     """
     A worker thread that monitors a single printer and puts events into a queue.
     It initializes COM for pywin32 to work correctly in a multi-threaded context.
+    If a recorder is given, every event is also appended to the recording, and
+    if a checkpoint store is given, each event advances the printer's
+    checkpointed job table once it has been processed.
+    The supervisor passes a `stop_event` to retire the worker and a `health`
+    record that the worker keeps up to date.
     """
+    # The Windows-only modules are imported here so that replaying a recording
+    # works on machines without the print spooler.
+    import pythoncom
+
+    from .monitor import watch_printer_queue
+
     try:
         pythoncom.CoInitialize()
-        for event in watch_printer_queue(printer_name):
+        for event in watch_printer_queue(
+            printer_name, stop_event=stop_event, checkpoint=checkpoint
+        ):
             # Check if the event is a dictionary and not an error string
             if isinstance(event, dict):
-                event_queue.put((printer_name, event))
+                if recorder:
+                    recorder.record(printer_name, event)
+                if health:
+                    health.record_event()
+                if checkpoint:
+                    event_queue.put(
+                        (
+                            printer_name,
+                            event,
+                            lambda event=event: checkpoint.record_event(printer_name, event),
+                        )
+                    )
+                else:
+                    event_queue.put((printer_name, event))
             else:
                 # If it's a string, it's likely an error message from the monitor
                 print(f"{Colors.RED}{event}{Colors.RESET}")
+                if health:
+                    health.record_error(event)
     except Exception as e:
         error_message = f"Error in monitor thread for '{printer_name}': {e}"
         print(f"{Colors.RED}{error_message}{Colors.RESET}")
+        if health:
+            health.record_error(error_message)
         # We don't queue this error to avoid an infinite loop of processing it
     finally:
         pythoncom.CoUninitialize()
@@ -67,9 +121,7 @@ def format_event_for_llm(event_data: dict, memory_context: str) -> str:
         submitted_str = "N/A"
 
     # Detect keywords in the document name
-    detected_keywords = [
-        p for p in PRE_DEFINED_PATTERNS if p.lower() in doc_name.lower()
-    ]
+    detected_keywords = get_settings().detect_keywords(doc_name)
     keyword_str = (
         f"Detected keywords in document name: {', '.join(detected_keywords)}."
         if detected_keywords
@@ -109,122 +161,491 @@ def format_event_for_llm(event_data: dict, memory_context: str) -> str:
     return " ".join(full_context)
 
 
-def main():
-    """The main function of the DocuMental application."""
-    print(
-        f"{Colors.BLUE}--- DocuMental: An Intelligent Printer Agent ---{Colors.RESET}"
-    )
+def remember_event(printer_name: str, event_data: dict, memory_data: dict, history=None) -> str:
+    """
+    Updates the memory and the job history for an event and returns its historical context.
 
-    try:
-        printers_to_monitor = get_available_printers()
-        if not printers_to_monitor:
-            print(
-                f"{Colors.RED}Error: No printers found on this system. Exiting.{Colors.RESET}"
-            )
-            return
-    except Exception as e:
-        print(f"{Colors.RED}Error fetching printers: {e}{Colors.RESET}")
-        return
+    Only new jobs are counted, so status changes and deletions don't inflate
+    the numbers. This runs on the pipeline's memory stage, one event at a time.
+    """
+    job_info = event_data.get("job_info", {})
+    with timed("memory"):
+        if event_data.get("event") == "new_job":
+            memory_context, _ = update_and_get_context(job_info, memory_data)
+            if history:
+                history.append(printer_name, job_info)
+            return memory_context
+        return get_context_without_updating(job_info, memory_data)
+
+
+def get_llm_comment(prompt: str):
+    """Asks the LLM to comment on a prompt. Returns None if it failed."""
+    with timed("llm"):
+        llm_message = get_llm_response(prompt)
+
+    if llm_message.startswith("Error:"):
+        print(f"{Colors.RED}{llm_message}{Colors.RESET}")
+        return None
+
+    print(f'{Colors.BLUE}LLM Response:{Colors.RESET} "{llm_message}" ')
+    return llm_message
+
+
+def notify_and_speak(printer_name: str, message: str):
+    """Delivers a message as a desktop notification and out loud."""
+    with timed("notify"):
+        notify_user(f"Printer Alert: {printer_name}", message)
+        speak_message(message)
 
-    print(f"\n{Colors.GREEN}DocuMental is now running...{Colors.RESET}")
-    print(
-        f"Monitoring all available printers: {Colors.CYAN}{', '.join(printers_to_monitor)}{Colors.RESET} (Press Ctrl+C to stop)"
-    )
     print("-" * 50)
 
-    # Load the persistent memory at startup
-    memory_data = load_memory()
 
-    # --- State Tracking for Notification Debouncing ---
-    # A set to keep track of job IDs that have already been processed.
-    processed_jobs = set()
+async def deliver_message(pipeline: Pipeline, printer_name: str, prompt: str, on_processed=None):
+    """
+    Asks the LLM to comment on a prompt and delivers the answer to the user.
+
+    `on_processed`, if given, is called once the event behind the prompt has
+    been dealt with, even if the LLM failed. It is not called when the work is
+    cancelled, so the event's source can offer it again after a restart.
+    """
+    try:
+        llm_message = await pipeline.run_stage("llm", get_llm_comment, prompt)
+        if llm_message:
+            # --- Dispatch Notifications ---
+            await pipeline.run_stage("notify", notify_and_speak, printer_name, llm_message)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        if on_processed:
+            on_processed()
+        raise
+    if on_processed:
+        on_processed()
+
+
+async def process_events(events: ThreadBridge, memory_data: dict, processed_jobs, history=None):
+    """
+    The orchestrator's main loop: takes events as they arrive and sends them through the pipeline.
+
+    Deduplication, digests and formatting are cheap and happen right here on
+    the event loop. Memory updates are awaited in order, and everything after
+    that (the LLM and the notifications) runs as in-flight work, so a slow
+    generation never holds up the next event.
+
+    Events arrive as `(printer, event)` or `(printer, event, on_processed)`.
+    The callback is invoked once the event is fully handled: skipped, added
+    to a digest, or delivered to the user.
+
+    Args:
+        events: Where the monitors, the hub or a replay deliver their events.
+        memory_data: The persistent memory, as loaded at startup.
+        processed_jobs: The set-like record of (printer, job ID) keys already announced.
+            A key is only added once its event has been handled.
+        history: The job history writer, if history is enabled.
+    """
+    pipeline = Pipeline()
+
     # A set of statuses that are important enough to warrant a notification even
     # if we have already notified about the job once.
     HIGH_PRIORITY_STATUSES = {
-        win32print.JOB_STATUS_ERROR,
-        win32print.JOB_STATUS_PAPEROUT,
-        win32print.JOB_STATUS_USER_INTERVENTION,
-        win32print.JOB_STATUS_BLOCKED_DEVQ,
+        JOB_STATUS_ERROR,
+        JOB_STATUS_PAPEROUT,
+        JOB_STATUS_USER_INTERVENTION,
+        JOB_STATUS_BLOCKED_DEVQ,
     }
 
-    event_queue = queue.Queue()
-    threads = []
+    # --- Digest Mode ---
+    # When a digest interval is configured, routine arrivals and completions are
+    # tallied per printer and summarized once per interval instead of one by one.
+    digests = DigestScheduler(lambda: get_settings().digest_interval)
+
+    # New jobs whose first event is still on its way through the pipeline. They
+    # are deduplicated like processed ones but not yet recorded as such.
+    announcing = set()
+
+    async def handle_event(printer_name: str, event_data: dict, on_processed):
+        """Deduplicates, remembers, digests or delivers a single event."""
+        job_info = event_data.get("job_info", {})
+        job_id = job_info.get("JobId")
+        status_code = job_info.get("Status", 0)
+        is_high_priority = any(
+            status_code & status for status in HIGH_PRIORITY_STATUSES
+        )
+
+        # A routine completion only counts towards the printer's digest. That
+        # happens before deduplication, since the job was almost always
+        # announced when it arrived and the deletion would be skipped.
+        if (
+            get_settings().digest_interval
+            and event_data.get("event") == "job_deleted"
+            and not is_high_priority
+        ):
+            digests.add(printer_name, event_data)
+            on_processed()
+            return
 
-    for printer_name in printers_to_monitor:
-        thread = threading.Thread(
-            target=printer_monitoring_worker,
-            args=(printer_name, event_queue),
-            daemon=True,
+        # --- Smart Notification Logic ---
+        # Decide whether to process the event or ignore it to prevent spam.
+        job_key = (printer_name, job_id)
+        if job_key in processed_jobs or job_key in announcing:
+            # If we've seen this job, only notify for high-priority events.
+            if not is_high_priority:
+                on_processed()
+                return  # Skip low-priority updates for already-seen jobs
+        else:
+            # If it's a new job, it only counts as processed once it has been
+            # handled. Until then a restart must still announce it.
+            announcing.add(job_key)
+
+            def on_processed(done=on_processed, job_key=job_key):
+                announcing.discard(job_key)
+                processed_jobs.add(job_key)
+                done()
+
+        print(
+            f"{Colors.MAGENTA}Detected Event on '{printer_name}':{Colors.RESET} "
+            f"{event_data.get('event')} for doc '{job_info.get('pDocument', 'N/A')}'"
+        )
+
+        memory_context = await pipeline.run_stage(
+            "memory", remember_event, printer_name, event_data, memory_data, history
+        )
+
+        # Routine arrivals wait for the printer's next digest. Errors and
+        # status changes are still reported right away.
+        if (
+            get_settings().digest_interval
+            and event_data.get("event") == "new_job"
+            and not is_high_priority
+        ):
+            doc_name = job_info.get("pDocument", "N/A")
+            doc_memory = memory_data["documents"].get(doc_name, {})
+            digests.add(
+                printer_name,
+                event_data,
+                reprint=doc_memory.get("print_count", 0) > 1,
+                keywords=get_settings().detect_keywords(doc_name),
+            )
+            on_processed()
+            return
+
+        # Format the rich event data into a string for the LLM
+        with timed("format"):
+            event_string_for_llm = format_event_for_llm(event_data, memory_context)
+
+        # print(f"{Colors.YELLOW}--- Sending to LLM: ---\n{event_string_for_llm}{Colors.RESET}")
+
+        await pipeline.spawn(
+            deliver_message(pipeline, printer_name, event_string_for_llm, on_processed)
         )
-        threads.append(thread)
-        thread.start()
 
     try:
         while True:
+            for digest_printer, digest_prompt in digests.due():
+                print(f"{Colors.MAGENTA}Sending activity digest for '{digest_printer}'.{Colors.RESET}")
+                await pipeline.spawn(deliver_message(pipeline, digest_printer, digest_prompt))
+
+            # Wait for the next event, or until the next digest is due.
             try:
-                printer_name, event_data = event_queue.get(timeout=1)
+                printer_name, event_data, *callbacks = await events.get(timeout=digests.next_due())
+            except asyncio.TimeoutError:
+                continue
+            on_processed = callbacks[0] if callbacks else (lambda: None)
 
-                if not isinstance(event_data, dict):
-                    print(
-                        f"{Colors.YELLOW}Received non-dict event: {event_data}{Colors.RESET}"
-                    )
-                    continue
-
-                job_info = event_data.get("job_info", {})
-                job_id = job_info.get("JobId")
-                status_code = job_info.get("Status", 0)
-
-                # --- Smart Notification Logic ---
-                # Decide whether to process the event or ignore it to prevent spam.
-                if job_id in processed_jobs:
-                    # If we've seen this job, only notify for high-priority events.
-                    is_high_priority = any(
-                        status_code & status for status in HIGH_PRIORITY_STATUSES
-                    )
-                    if not is_high_priority:
-                        continue  # Skip low-priority updates for already-seen jobs
-                else:
-                    # If it's a new job, mark it as processed.
-                    processed_jobs.add(job_id)
+            if event_data is REPLAY_FINISHED:
+                break
 
+            if not isinstance(event_data, dict):
                 print(
-                    f"{Colors.MAGENTA}Detected Event on '{printer_name}':{Colors.RESET} "
-                    f"{event_data.get('event')} for doc '{job_info.get('pDocument', 'N/A')}'"
+                    f"{Colors.YELLOW}Received non-dict event: {event_data}{Colors.RESET}"
                 )
+                on_processed()
+                continue
 
-                # Update memory only for new jobs to avoid duplicate counting.
-                event_type = event_data.get("event")
-                memory_context = ""
-                if event_type == "new_job":
-                    memory_context, memory_data = update_and_get_context(
-                        job_info, memory_data
-                    )
-                else:
-                    memory_context = get_context_without_updating(job_info, memory_data)
+            try:
+                await handle_event(printer_name, event_data, on_processed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # One malformed event must not stop the orchestrator. It is marked
+                # as processed so its source doesn't offer it again and again.
+                print(
+                    f"{Colors.RED}Error while processing an event from '{printer_name}': {e}{Colors.RESET}"
+                )
+                on_processed()
+
+        # A finished replay still owes the user whatever was collected so far.
+        for digest_printer, digest_prompt in digests.due(flush=True):
+            print(f"{Colors.MAGENTA}Sending activity digest for '{digest_printer}'.{Colors.RESET}")
+            await pipeline.spawn(deliver_message(pipeline, digest_printer, digest_prompt))
+        await pipeline.drain()
+    finally:
+        await pipeline.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses the command-line options of the `documental` entry point."""
+    parser = argparse.ArgumentParser(
+        prog="documental", description="A printer agent with an attitude."
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Append every spooler event to a compressed recording file.",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Feed a recording into the pipeline instead of watching real printers.",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="JOBS",
+        help="Feed this many made-up print jobs into the pipeline as fast as possible.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="documental-profile",
+        metavar="PREFIX",
+        help="Profile the pipeline and write the results to PREFIX.* on exit. "
+        "Default prefix: documental-profile.",
+    )
+    parser.add_argument(
+        "--speed",
+        default="1",
+        help="Replay speed: 1 for real time, N for N times faster, or 'max'. Default: 1.",
+    )
+    parser.add_argument(
+        "--hub",
+        nargs="?",
+        const="",
+        metavar="HOST:PORT",
+        help="Run as a hub: accept events from agents instead of watching local printers.",
+    )
+    parser.add_argument(
+        "--agent",
+        metavar="HOST:PORT",
+        help="Run as a lightweight agent: forward events to the hub at this address.",
+    )
+    parser.add_argument(
+        "--name",
+        default=socket.gethostname(),
+        help="The name this agent reports to the hub. Default: the host name.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        help="Where to keep the restart checkpoint. Default: checkpoint.json, "
+        "or checkpoint-hub.json / checkpoint-agent-NAME.json in hub and agent mode.",
+    )
+    parser.add_argument(
+        "--history",
+        metavar="DIR",
+        help="Where to keep the job history for `documental report`. Default: ./history "
+        "(replays and synthetic runs only write a history when this is given).",
+    )
+    parser.add_argument(
+        "--printer",
+        action="append",
+        dest="printers",
+        metavar="NAME",
+        help="Only replay events from this printer, or spread synthetic jobs over these "
+        "printers. Can be given more than once.",
+    )
+
+    subcommands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    add_report_arguments(
+        subcommands.add_parser(
+            "report",
+            help="Report on the print job history instead of running the agent.",
+            description="Reports on the print job history.",
+        )
+    )
 
-                # Format the rich event data into a string for the LLM
-                event_string_for_llm = format_event_for_llm(event_data, memory_context)
+    args = parser.parse_args(argv)
+    if args.command == "report":
+        return args
+    if args.hub is not None and args.agent:
+        parser.error("--hub and --agent cannot be used together")
+    if sum(bool(source) for source in (args.hub is not None, args.replay, args.synthetic)) > 1:
+        parser.error("only one of --hub, --replay and --synthetic can be used")
+    if args.speed == "max":
+        args.speed = 0.0
+    else:
+        try:
+            args.speed = float(args.speed)
+        except ValueError:
+            parser.error("--speed must be a number or 'max'")
+    return args
 
-                # print(f"{Colors.YELLOW}--- Sending to LLM: ---\n{event_string_for_llm}{Colors.RESET}")
 
-                llm_message = get_llm_response(event_string_for_llm)
+def main():
+    """The main function of the DocuMental application."""
+    args = parse_args()
+    if args.command == "report":
+        run_report(args)
+        return
 
-                if llm_message.startswith("Error:"):
-                    print(f"{Colors.RED}{llm_message}{Colors.RESET}")
-                    continue  # Skip to the next event
+    print(
+        f"{Colors.BLUE}--- DocuMental: An Intelligent Printer Agent ---{Colors.RESET}"
+    )
 
-                print(f'{Colors.BLUE}LLM Response:{Colors.RESET} "{llm_message}" ')
+    # Pick up changes to config.json and the persona without restarting.
+    settings_watcher = start_settings_watcher()
+
+    # Everything started below is stopped in the `finally`, however the run ends.
+    profiler = None
+    loop = None
+    recorder = None
+    supervisor = None
+    checkpoint = None
+    scratch_memory = None
+    model_benchmarks = None
+    history = None
+    try:
+        if args.profile:
+            profiler = PipelineProfiler(args.profile)
+            profiler.start()
+
+        # Agents forward events from a plain queue. Everywhere else, events are
+        # bridged straight into the event loop that runs the pipeline.
+        if args.agent:
+            event_queue = queue.Queue()
+        else:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            event_queue = ThreadBridge(loop)
+
+        # Replays and synthetic runs are meant to be deterministic, so they never
+        # resume from a checkpoint.
+        if not (args.replay or args.synthetic):
+            checkpoint_path = args.checkpoint
+            if not checkpoint_path:
+                if args.hub is not None:
+                    checkpoint_path = "checkpoint-hub.json"
+                elif args.agent:
+                    checkpoint_path = f"checkpoint-agent-{args.name}.json"
+                else:
+                    checkpoint_path = "checkpoint.json"
+            checkpoint = CheckpointStore(checkpoint_path)
+            checkpoint.start()
 
-                # --- Dispatch Notifications ---
-                notify_user(f"Printer Alert: {printer_name}", llm_message)
-                speak_message(llm_message)
+        if args.hub is not None:
+            print(f"\n{Colors.GREEN}DocuMental is running as a hub...{Colors.RESET}")
+            try:
+                start_hub(parse_address(args.hub), event_queue)
+            except OSError as e:
+                print(f"{Colors.RED}Error starting the hub: {e}{Colors.RESET}")
+                return
+        elif args.replay:
+            print(f"\n{Colors.GREEN}DocuMental is replaying {args.replay}...{Colors.RESET}")
+            thread = threading.Thread(
+                target=replay_worker,
+                args=(args.replay, event_queue, args.speed, args.printers),
+                daemon=True,
+            )
+            thread.start()
+        elif args.synthetic:
+            print(f"\n{Colors.GREEN}DocuMental is processing {args.synthetic} synthetic jobs...{Colors.RESET}")
+            thread = threading.Thread(
+                target=synthetic_worker,
+                args=(event_queue, args.synthetic, args.printers),
+                daemon=True,
+            )
+            thread.start()
+        else:
+            print(f"\n{Colors.GREEN}DocuMental is now running...{Colors.RESET}")
+
+            if args.record:
+                recorder = EventRecorder(args.record)
+
+            # The supervisor watches every installed printer, picks up printers added
+            # later on, and restarts watchers that crash.
+            supervisor = PrinterSupervisor(
+                printer_monitoring_worker,
+                worker_args=(event_queue, recorder, checkpoint),
+            )
+            supervisor.start()
+            if supervisor.watchers:
+                print(
+                    f"Monitoring all available printers: {Colors.CYAN}{', '.join(supervisor.watchers)}{Colors.RESET} (Press Ctrl+C to stop)"
+                )
+            else:
+                print(
+                    f"{Colors.YELLOW}No printers found yet. Waiting for printers to be added... (Press Ctrl+C to stop){Colors.RESET}"
+                )
+        print("-" * 50)
 
-                print("-" * 50)
+        if args.agent:
+            # Agents only forward events; the hub does all the thinking.
+            try:
+                HubAgent(parse_address(args.agent, "localhost"), args.name, event_queue).run()
+            except KeyboardInterrupt:
+                print(f"\n{Colors.YELLOW}Agent stopped by user. Goodbye!{Colors.RESET}")
+            return
 
-            except queue.Empty:
-                continue
-    except KeyboardInterrupt:
-        print(f"\n{Colors.YELLOW}Monitoring stopped by user. Goodbye!{Colors.RESET}")
+        # Replays and synthetic runs (profiled or not) work on a throwaway copy of
+        # the memory, so their traffic never becomes part of what the agent remembers.
+        if args.replay or args.synthetic:
+            scratch_memory = use_scratch_memory()
+            print(f"{Colors.CYAN}Using a temporary copy of the memory at {scratch_memory}.{Colors.RESET}")
+
+        # Load the persistent memory at startup
+        memory_data = load_memory()
+
+        # Keep auditioning the LLM servers' models, so alerts come from the fastest
+        # model that still follows the persona's rules. Replays, synthetic and
+        # profiled runs skip it: it would skew their timings and make the
+        # server load every model it lists.
+        if not (args.replay or args.synthetic or args.profile):
+            model_benchmarks = start_model_benchmarks()
+
+        # Every new job is also appended to the columnar job history for reports.
+        # Replaying the same recording twice would count its jobs twice, so
+        # replays and synthetic runs only keep a history when asked to.
+        if args.history or not (args.replay or args.synthetic):
+            history = open_history_writer(args.history or HISTORY_DIR_PATH)
+
+        # --- State Tracking for Notification Debouncing ---
+        # A set to keep track of (printer, job ID) pairs that have already been processed.
+        # Job IDs are only unique per printer, which matters once a hub serves many print servers.
+        # When checkpointing, the set survives restarts so old jobs are not announced twice.
+        processed_jobs = checkpoint.processed if checkpoint else set()
+
+        pipeline_task = loop.create_task(
+            process_events(event_queue, memory_data, processed_jobs, history)
+        )
+        try:
+            loop.run_until_complete(pipeline_task)
+        except KeyboardInterrupt:
+            print(f"\n{Colors.YELLOW}Monitoring stopped by user. Goodbye!{Colors.RESET}")
+            # Give the pipeline the chance to cancel its in-flight work cleanly.
+            if not pipeline_task.done():
+                pipeline_task.cancel()
+                try:
+                    loop.run_until_complete(pipeline_task)
+                except asyncio.CancelledError:
+                    pass
+    finally:
+        settings_watcher.set()
+        if model_benchmarks:
+            model_benchmarks.set()
+        if supervisor:
+            supervisor.stop()
+        if recorder:
+            recorder.close()
+        if checkpoint:
+            checkpoint.close()
+        if history:
+            history.close()
+        if profiler:
+            profiler.stop()
+        if scratch_memory and os.path.exists(scratch_memory):
+            os.remove(scratch_memory)
+        if loop:
+            loop.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+The Replay Module: The Flight Recorder
+
+This module captures the raw events produced by the monitor so that a busy
+day at the print server can be played back later on any machine. Recordings
+are compact, append-only, gzip-compressed JSON-lines files, where every line
+holds a timestamp, the printer the event came from, and the event itself.
+
+A recording can be replayed into the normal pipeline in real time, sped up
+by any factor, or as fast as possible. No Windows APIs are needed, which makes
+replays useful for deterministic performance runs and offline profiling.
+"""
+
+import gzip
+import json
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from .const import RECORDER_FLUSH_INTERVAL, Colors
+
+# Placed on the event queue once a replay has been fully delivered.
+REPLAY_FINISHED = object()
+
+
+def encode_event_value(value):
+    """JSON fallback for values found in job info, such as `pywintypes.datetime`."""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return str(value)
+
+
+def decode_event_object(obj: dict):
+    """
+    JSON object hook that restores values encoded by `encode_event_value`.
+
+    Raises:
+        ValueError: If an encoded timestamp is not an ISO 8601 string.
+    """
+    if len(obj) == 1 and "$dt" in obj:
+        if not isinstance(obj["$dt"], str):
+            raise ValueError(f"expected an ISO timestamp, got {type(obj['$dt']).__name__}")
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+class EventRecorder:
+    """
+    Appends monitor events to a compressed recording file.
+
+    Recording is thread-safe, so a single recorder can be shared by all of
+    the printer monitoring threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Opening in append mode adds a new gzip member to an existing file,
+        # so separate recording sessions simply follow one another.
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.count = 0
+        print(f"{Colors.GREEN}Recording spooler events to {path}.{Colors.RESET}")
+
+    def record(self, printer_name: str, event: dict):
+        """Appends a single event, tagged with the current time and its printer."""
+        line = json.dumps(
+            {"t": time.time(), "p": printer_name, "e": event},
+            default=encode_event_value,
+            separators=(",", ":"),
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+            now = time.monotonic()
+            if now - self._last_flush >= RECORDER_FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """Flushes and closes the recording file."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                print(f"Recorded {self.count} events to {self.path}.")
+
+
+def read_recording(path: str, printers=None):
+    """
+    Reads a recording file, yielding `(timestamp, printer_name, event)` tuples.
+
+    A recording that was cut short (for example because the agent was killed
+    mid-write) is read up to the last complete event.
+
+    Args:
+        path: The recording file to read.
+        printers: An optional collection of printer names to keep. Events from
+            all other printers are skipped.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line, object_hook=decode_event_object)
+                except ValueError:
+                    # A partially written final line.
+                    break
+                if printers and record["p"] not in printers:
+                    continue
+                yield record["t"], record["p"], record["e"]
+    except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+        print(
+            f"{Colors.YELLOW}Warning: Recording {path} ends unexpectedly. Replaying what was readable. Error: {e}{Colors.RESET}"
+        )
+
+
+def replay_events(path: str, speed: float = 1.0, printers=None):
+    """
+    Yields `(printer_name, event)` pairs from a recording, paced like the original.
+
+    Args:
+        path: The recording file to replay.
+        speed: Playback speed multiplier. 1 replays in real time, 10 replays ten
+            times faster, and 0 (or any non-positive value) replays as fast as possible.
+        printers: An optional collection of printer names to replay.
+    """
+    first_timestamp = None
+    start = time.monotonic()
+    for timestamp, printer_name, event in read_recording(path, printers):
+        if speed > 0:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = (timestamp - first_timestamp) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        yield printer_name, event
+
+
+def replay_worker(path: str, event_queue: queue.Queue, speed: float = 1.0, printers=None):
+    """
+    A worker thread that feeds a recording into the event queue, standing in for the monitors.
+
+    Once the whole recording has been delivered, `REPLAY_FINISHED` is queued so
+    the orchestrator knows the run is over.
+    """
+    count = 0
+    try:
+        for printer_name, event in replay_events(path, speed, printers):
+            event_queue.put((printer_name, event))
+            count += 1
+    except OSError as e:
+        print(f"{Colors.RED}Error reading recording {path}: {e}{Colors.RESET}")
+    finally:
+        print(f"{Colors.CYAN}Replay finished after {count} events.{Colors.RESET}")
+        event_queue.put((None, REPLAY_FINISHED))
@@ -0,0 +1,174 @@
+"""
+The Report Module: The Annual Review
+
+This module turns the job history log into reports: pages per user per week,
+the busiest hours of the day, the heaviest users and the most printed
+documents. It runs as `documental report <kind>`.
+
+Every report works directly on the memory-mapped columns from the history
+module. Counting is done with `Counter` and `zip` over whole columns, so the
+per-row work stays in C wherever possible and no row is ever turned into a
+dictionary. Filters build one boolean mask per column with `map` and apply it
+with `compress`. Rows are not in date order (replayed and buffered events
+arrive late), so a `--since` cut-off is a mask too, not a binary search.
+"""
+
+import argparse
+import operator
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import compress
+
+from .const import REPORT_DEFAULT_LIMIT, Colors
+from .history import HISTORY_DIR_PATH, JobHistoryReader, day_to_date
+
+
+def select_columns(
+    reader: JobHistoryReader, names: list, since_days: int = None, printer: str = None, user: str = None
+) -> dict:
+    """
+    Returns the requested columns, restricted to the rows matching the filters.
+
+    Without filters, the columns are the zero-copy views of the mapped files.
+    Each filter builds a row mask once, and the combined mask is applied to
+    every requested column.
+
+    Args:
+        reader: An open history reader.
+        names: The names of the columns to return.
+        since_days: Only include jobs from the last N days, today included.
+        printer: Only include jobs sent to this printer.
+        user: Only include jobs from this user.
+
+    Returns:
+        A dictionary mapping each column name to a sequence of values.
+    """
+    masks = []
+    if since_days is not None:
+        cutoff = date.today().toordinal() - since_days + 1
+        masks.append(list(map(cutoff.__le__, reader.columns["day"])))
+
+    for column, text in (("printer", printer), ("user", user)):
+        if text is None:
+            continue
+        string_id = reader.string_ids.get(text)
+        if string_id is None:
+            return {name: [] for name in names}
+        masks.append(list(map(string_id.__eq__, reader.columns[column])))
+
+    if not masks:
+        return {name: reader.columns[name] for name in names}
+    mask = masks[0] if len(masks) == 1 else list(map(operator.and_, *masks))
+    return {name: list(compress(reader.columns[name], mask)) for name in names}
+
+
+def _sum_by(keys, values) -> dict:
+    """Sums `values` grouped by the matching entry of `keys`."""
+    totals = defaultdict(int)
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return totals
+
+
+def pages_per_user_per_week(reader: JobHistoryReader, **filters) -> list:
+    """Returns (week start, user, jobs, pages) rows, newest week first, busiest user first."""
+    columns = select_columns(reader, ["user", "week", "pages"], **filters)
+    keys = list(zip(columns["user"], columns["week"]))
+    jobs = Counter(keys)
+    pages = _sum_by(keys, columns["pages"])
+    rows = [
+        (day_to_date(week), reader.strings[user], jobs[(user, week)], total)
+        for (user, week), total in pages.items()
+    ]
+    rows.sort(key=lambda row: (row[0], row[3]), reverse=True)
+    return rows
+
+
+def peak_hours(reader: JobHistoryReader, **filters) -> list:
+    """Returns (hour, jobs, pages) rows for every hour of the day."""
+    columns = select_columns(reader, ["hour", "pages"], **filters)
+    jobs = Counter(columns["hour"])
+    pages = _sum_by(columns["hour"], columns["pages"])
+    return [(hour, jobs[hour], pages.get(hour, 0)) for hour in range(24)]
+
+
+def top_by(reader: JobHistoryReader, column: str, **filters) -> list:
+    """Returns (name, jobs, pages) rows for a string column, most pages first."""
+    columns = select_columns(reader, [column, "pages"], **filters)
+    jobs = Counter(columns[column])
+    pages = _sum_by(columns[column], columns["pages"])
+    rows = [(reader.strings[key], jobs[key], total) for key, total in pages.items()]
+    rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+    return rows
+
+
+def _print_table(headers: tuple, rows: list):
+    """Prints rows as a left-aligned text table."""
+    cells = [[str(value) for value in row] for row in rows]
+    widths = [
+        max([len(header)] + [len(row[i]) for row in cells])
+        for i, header in enumerate(headers)
+    ]
+    print(
+        Colors.CYAN
+        + "  ".join(header.ljust(width) for header, width in zip(headers, widths))
+        + Colors.RESET
+    )
+    for row in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def add_report_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of `documental report` to its subcommand parser."""
+    parser.add_argument(
+        "kind",
+        choices=["weekly", "hours", "users", "documents"],
+        help="weekly: pages per user per week. hours: jobs per hour of the day. "
+        "users / documents: the heaviest users or most printed documents.",
+    )
+    parser.add_argument(
+        "--history",
+        # Leaves a --history given before `report` in place.
+        default=argparse.SUPPRESS,
+        metavar="DIR",
+        help="The job history directory. Default: ./history",
+    )
+    parser.add_argument("--since", type=int, metavar="DAYS", help="Only include the last N days.")
+    parser.add_argument("--printer", help="Only include jobs sent to this printer.")
+    parser.add_argument("--user", help="Only include jobs from this user.")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=REPORT_DEFAULT_LIMIT,
+        help=f"Maximum number of rows to show. Default: {REPORT_DEFAULT_LIMIT}.",
+    )
+
+
+def run_report(args: argparse.Namespace):
+    """Runs `documental report` with the options parsed by `add_report_arguments`."""
+    filters = {"since_days": args.since, "printer": args.printer, "user": args.user}
+    history_path = args.history or HISTORY_DIR_PATH
+
+    with JobHistoryReader(history_path) as reader:
+        if not reader.rows:
+            print(f"{Colors.YELLOW}The job history at {history_path} is empty.{Colors.RESET}")
+            return
+
+        print(f"{Colors.BLUE}--- DocuMental Report: {args.kind} ({reader.rows} jobs on record) ---{Colors.RESET}")
+        if args.kind == "weekly":
+            rows = pages_per_user_per_week(reader, **filters)[: args.limit]
+            _print_table(("Week of", "User", "Jobs", "Pages"), rows)
+        elif args.kind == "hours":
+            rows = peak_hours(reader, **filters)
+            busiest = max(row[1] for row in rows) or 1
+            _print_table(
+                ("Hour", "Jobs", "Pages", ""),
+                [
+                    (f"{hour:02d}:00", jobs, pages, "#" * round(30 * jobs / busiest))
+                    for hour, jobs, pages in rows
+                ],
+            )
+        else:
+            column = "user" if args.kind == "users" else "document"
+            rows = top_by(reader, column, **filters)[: args.limit]
+            _print_table((column.capitalize(), "Jobs", "Pages"), rows)
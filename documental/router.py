@@ -0,0 +1,265 @@
+"""
+The Router Module: The Switchboard
+
+This module lets the brain spread its thinking across several OpenAI-compatible
+LLM servers. It measures each endpoint's latency and in-flight load, sends every
+request to whichever endpoint currently looks fastest, and fires a hedged
+duplicate at a second endpoint when the first one is running slower than usual.
+Endpoints that keep failing are benched for a while and automatically given
+another chance once their cooldown expires.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from .const import (
+    ENDPOINT_EJECT_SECONDS,
+    ENDPOINT_FAILURE_THRESHOLD,
+    ENDPOINT_MAX_EJECT_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    LATENCY_WINDOW,
+    PIPELINE_MAX_IN_FLIGHT,
+    Colors,
+)
+from .profiling import profile_worker_thread
+
+
+class Endpoint:
+    """Latency and health bookkeeping for a single LLM server."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        """Returns True if the endpoint is not currently benched."""
+        return now >= self.ejected_until
+
+    def percentile(self, fraction: float):
+        """Returns the given latency percentile in seconds, or None if nothing was measured yet."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def hedge_delay(self):
+        """Returns the p95 latency once enough samples exist to trust it, otherwise None."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.percentile(0.95)
+
+    def score(self) -> float:
+        """
+        Estimates how long a new request would take on this endpoint. Lower is better.
+
+        Unmeasured endpoints score zero so that newly added servers are tried
+        right away, and every queued request or recent failure makes an endpoint
+        look proportionally slower. Ranking puts fewer consecutive failures
+        first regardless (see `EndpointPool._ranked`), since a server that has
+        never answered has no latency to scale.
+        """
+        median = self.percentile(0.5) or 0.0
+        return median * (1 + self.in_flight) * (1 + self.consecutive_failures)
+
+
+class AttemptCancelled(Exception):
+    """Raised inside a request function that noticed its attempt lost a hedge race."""
+
+
+class _Attempt:
+    """A single request in flight against one endpoint, with its own HTTP session."""
+
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.session = requests.Session()
+        # Set when the attempt loses a hedge race. The request function checks it
+        # between chunks of the response so the worker thread is freed early.
+        self.cancelled = threading.Event()
+        # Set once a worker actually begins the attempt, as opposed to queueing it.
+        self.started = threading.Event()
+        self.start_time = None
+        self.future = None
+
+
+class EndpointPool:
+    """
+    Routes requests across a set of endpoints by measured latency and load.
+
+    The request itself is supplied as a callable taking the endpoint URL, a
+    `requests.Session` and a cancellation `threading.Event`, so the pool stays
+    ignorant of what is being asked. A request function that sees the event
+    set should stop reading and raise `AttemptCancelled`.
+    When the endpoint list changes, a new pool can be built from the `previous`
+    one so endpoints that remain keep their measurements.
+    """
+
+    def __init__(self, urls: list, previous: "EndpointPool" = None):
+        # Endpoints that were already known keep their latency history and health.
+        known = {ep.url: ep for ep in previous.endpoints} if previous else {}
+        self.endpoints = [known.get(url.rstrip("/")) or Endpoint(url) for url in urls]
+        # Shared endpoints are still updated by in-flight calls on the old pool,
+        # so both pools must use the same lock.
+        self._lock = previous._lock if previous else threading.Lock()
+        # Every event the pipeline has in flight may have a primary and a
+        # hedged attempt running at once. Threads are only created when needed.
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * max(PIPELINE_MAX_IN_FLIGHT, len(self.endpoints)),
+            thread_name_prefix="llm-router",
+            initializer=profile_worker_thread,
+        )
+
+    def _ranked(self) -> list:
+        """Returns the endpoints to try, best first: fewest recent failures, then lowest score."""
+        now = time.monotonic()
+        with self._lock:
+            available = [ep for ep in self.endpoints if ep.is_available(now)]
+            if available:
+                return sorted(available, key=lambda ep: (ep.consecutive_failures, ep.score()))
+            # Everything is benched; try whichever endpoint comes back first
+            # rather than refusing to answer at all.
+            return sorted(self.endpoints, key=lambda ep: ep.ejected_until)
+
+    def _start(self, endpoint: Endpoint, request_fn) -> _Attempt:
+        """Submits the request against the given endpoint and returns its attempt."""
+        attempt = _Attempt(endpoint)
+        with self._lock:
+            endpoint.in_flight += 1
+        try:
+            attempt.future = self._executor.submit(self._run, attempt, request_fn)
+        except RuntimeError:
+            # The pool was retired by a settings reload while this call was in
+            # progress. Finish it on a short-lived thread rather than failing it.
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-router-retired")
+            attempt.future = executor.submit(self._run, attempt, request_fn)
+            executor.shutdown(wait=False)
+        return attempt
+
+    def _run(self, attempt: _Attempt, request_fn):
+        """Executes one attempt on a worker thread and records its outcome."""
+        attempt.start_time = time.monotonic()
+        attempt.started.set()
+        try:
+            if attempt.cancelled.is_set():
+                raise AttemptCancelled()
+            result = request_fn(attempt.endpoint.url, attempt.session, attempt.cancelled)
+        except Exception:
+            self._record(attempt, None)
+            raise
+        finally:
+            attempt.session.close()
+        self._record(attempt, time.monotonic() - attempt.start_time)
+        return result
+
+    def _record(self, attempt: _Attempt, latency):
+        """Updates the endpoint's statistics. A latency of None marks a failure."""
+        endpoint = attempt.endpoint
+        with self._lock:
+            endpoint.in_flight -= 1
+            # A hedging loser tells us nothing about the endpoint's health.
+            if attempt.cancelled.is_set():
+                return
+
+            if latency is not None:
+                if endpoint.ejections:
+                    print(
+                        f"{Colors.GREEN}LLM endpoint {endpoint.url} recovered and is back in rotation.{Colors.RESET}"
+                    )
+                endpoint.latencies.append(latency)
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+                return
+
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= ENDPOINT_FAILURE_THRESHOLD:
+                endpoint.ejections += 1
+                cooldown = min(
+                    ENDPOINT_EJECT_SECONDS * 2 ** (endpoint.ejections - 1),
+                    ENDPOINT_MAX_EJECT_SECONDS,
+                )
+                endpoint.ejected_until = time.monotonic() + cooldown
+                print(
+                    f"{Colors.YELLOW}LLM endpoint {endpoint.url} failed {endpoint.consecutive_failures} times in a row. "
+                    f"Removing it from rotation for {cooldown} seconds.{Colors.RESET}"
+                )
+
+    def _cancel(self, attempt: _Attempt):
+        """Abandons a losing attempt and closes its connection."""
+        attempt.cancelled.set()
+        if attempt.future.cancel():
+            # It never started running, so `_run` will not release its slot.
+            with self._lock:
+                attempt.endpoint.in_flight -= 1
+        attempt.session.close()
+
+    def call(self, request_fn):
+        """
+        Runs `request_fn(url, session, cancelled)` on the best endpoint, hedging if it is slow.
+
+        If the primary endpoint has not answered within its own p95 latency, the
+        same request is sent to the next-best endpoint. Whichever answers first
+        wins and the other attempt is cancelled. The p95 is measured from when
+        a worker starts the attempt, so time spent waiting for a free worker
+        never triggers a hedge. When an attempt fails, the request moves on to
+        the next ranked endpoint that has not been tried yet.
+
+        Returns:
+            Whatever `request_fn` returned for the winning attempt.
+
+        Raises:
+            The exception from the last failed attempt if none of them succeeded.
+        """
+        untried = self._ranked()
+        primary = self._start(untried.pop(0), request_fn)
+        attempts = {primary.future: primary}
+
+        hedge_delay = primary.endpoint.hedge_delay() if untried else None
+        if hedge_delay is not None:
+            primary.started.wait()
+            remaining = hedge_delay - (time.monotonic() - primary.start_time)
+            done, _ = wait([primary.future], timeout=max(0.0, remaining))
+            if not done:
+                backup = untried.pop(0)
+                print(
+                    f"{Colors.CYAN}{primary.endpoint.url} is slower than its p95 ({hedge_delay:.2f}s). "
+                    f"Hedging with {backup.url}.{Colors.RESET}"
+                )
+                hedge = self._start(backup, request_fn)
+                attempts[hedge.future] = hedge
+
+        last_error = None
+        while attempts:
+            done, _ = wait(attempts, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = attempts.pop(future)
+                error = future.exception()
+                if error is None:
+                    for loser in attempts.values():
+                        self._cancel(loser)
+                    return future.result()
+                last_error = error
+                if untried:
+                    fallback = untried.pop(0)
+                    print(
+                        f"{Colors.YELLOW}{attempt.endpoint.url} failed ({error}). "
+                        f"Trying {fallback.url}.{Colors.RESET}"
+                    )
+                    retry = self._start(fallback, request_fn)
+                    attempts[retry.future] = retry
+        raise last_error
+
+    def shutdown(self):
+        """
+        Releases the worker threads once the pool has been replaced.
+
+        Attempts already running are allowed to finish, and calls still in
+        progress on this pool keep working.
+        """
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,191 @@
+"""
+The Settings Module: The Mood Swings
+
+This module holds everything the running agent may change its mind about:
+the LLM endpoints, the persona, the keywords it pounces on, the monitor's
+debounce window and the digest interval. It watches `config.json` and the
+persona file, validates any change, and swaps in a complete new set of
+settings in one step, without restarting the agent or re-snapshotting printers.
+
+Each `Settings` object is immutable once built. Callers grab the current one
+at the start of a piece of work and use it throughout, so an in-flight LLM
+request finishes with the version it started on. Everything derived from the
+settings (the endpoint pool, the lowercased keyword matcher and the system
+message) is built once, when the new version is created.
+"""
+
+import json
+import os
+import threading
+
+from .const import (
+    CONFIG_RELOAD_INTERVAL,
+    DIGEST_INTERVAL_SECONDS,
+    PRE_DEFINED_PATTERNS,
+    STATUS_DEBOUNCE_SECONDS,
+    Colors,
+)
+from .personality import SYSTEM_PROMPT
+from .router import EndpointPool
+from .utils import CONFIG_FILE_PATH, get_llm_endpoints, load_or_create_config
+
+
+class SettingsError(ValueError):
+    """Raised when a configuration change is invalid and must not be applied."""
+
+
+class Settings:
+    """One validated, immutable version of the agent's runtime settings."""
+
+    def __init__(self, config: dict, previous: "Settings" = None):
+        self.version = previous.version + 1 if previous else 1
+        self.config = config
+
+        for section in ("llm", "personality", "monitor", "digest"):
+            if not isinstance(config.get(section, {}), dict):
+                raise SettingsError(f"'{section}' must be an object.")
+
+        # A single URL is accepted as shorthand, anything else must be a list of
+        # them. Other shapes, like an object keyed by URL, would otherwise slip through.
+        endpoints = config.get("llm", {}).get("endpoints")
+        if endpoints is not None and not isinstance(endpoints, str) and not (
+            isinstance(endpoints, list) and all(isinstance(url, str) for url in endpoints)
+        ):
+            raise SettingsError("'llm.endpoints' must be a list of URLs.")
+        self.endpoints = get_llm_endpoints(config)
+        for endpoint in self.endpoints:
+            if not isinstance(endpoint, str) or not endpoint.startswith(("http://", "https://")):
+                raise SettingsError(f"Invalid LLM endpoint: {endpoint!r}")
+
+        personality_config = config.get("personality", {})
+        self.persona_path = personality_config.get("system_prompt_file")
+        if self.persona_path:
+            try:
+                with open(self.persona_path, "r", encoding="utf-8") as f:
+                    self.system_prompt = f.read()
+            except IOError as e:
+                raise SettingsError(f"Could not read persona file {self.persona_path}: {e}")
+            if not self.system_prompt.strip():
+                raise SettingsError(f"Persona file {self.persona_path} is empty.")
+        else:
+            self.system_prompt = SYSTEM_PROMPT
+
+        keywords = personality_config.get("keywords", PRE_DEFINED_PATTERNS)
+        if not isinstance(keywords, list) or not all(
+            isinstance(k, str) and k.strip() for k in keywords
+        ):
+            raise SettingsError("'personality.keywords' must be a list of non-empty strings.")
+        self.keywords = keywords
+
+        self.debounce_seconds = config.get("monitor", {}).get(
+            "debounce_seconds", STATUS_DEBOUNCE_SECONDS
+        )
+        if not isinstance(self.debounce_seconds, (int, float)) or self.debounce_seconds < 0:
+            raise SettingsError("'monitor.debounce_seconds' must be a non-negative number.")
+
+        self.digest_interval = config.get("digest", {}).get(
+            "interval_seconds", DIGEST_INTERVAL_SECONDS
+        )
+        if not isinstance(self.digest_interval, (int, float)) or self.digest_interval < 0:
+            raise SettingsError("'digest.interval_seconds' must be a non-negative number.")
+
+        # --- Derived State, Built Once per Version ---
+        self._keywords_lower = tuple((k, k.lower()) for k in keywords)
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        if previous and previous.endpoints == self.endpoints:
+            self.endpoint_pool = previous.endpoint_pool
+        else:
+            self.endpoint_pool = EndpointPool(
+                self.endpoints, previous=previous.endpoint_pool if previous else None
+            )
+
+    def detect_keywords(self, doc_name: str) -> list:
+        """Returns the configured keywords that appear in a document name, case-insensitively."""
+        doc_lower = doc_name.lower()
+        return [keyword for keyword, lower in self._keywords_lower if lower in doc_lower]
+
+
+_current = None
+_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Returns the current settings, loading them from `config.json` on first use."""
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                try:
+                    _current = Settings(load_or_create_config())
+                except SettingsError as e:
+                    print(
+                        f"{Colors.RED}Invalid configuration, using the defaults. Error: {e}{Colors.RESET}"
+                    )
+                    _current = Settings({})
+    return _current
+
+
+def reload_settings() -> bool:
+    """
+    Re-reads `config.json` (and the persona file) and applies the result if it is valid.
+
+    Returns:
+        True if a new version was applied, False if the change was rejected.
+    """
+    global _current
+    try:
+        with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise SettingsError("The configuration must be a JSON object.")
+        with _lock:
+            previous = get_settings()
+            new_settings = Settings(config, previous=previous)
+            _current = new_settings
+    except (json.JSONDecodeError, IOError, SettingsError) as e:
+        print(
+            f"{Colors.RED}Rejected configuration change, keeping the current settings. Error: {e}{Colors.RESET}"
+        )
+        return False
+    if new_settings.endpoint_pool is not previous.endpoint_pool:
+        previous.endpoint_pool.shutdown()
+    print(f"{Colors.GREEN}Applied configuration version {new_settings.version}.{Colors.RESET}")
+    return True
+
+
+def _file_signature(path):
+    """The modification time and size of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except (OSError, TypeError):
+        return None
+
+
+def _watch_settings(stop_event: threading.Event):
+    def signature():
+        settings = get_settings()
+        return _file_signature(CONFIG_FILE_PATH), _file_signature(settings.persona_path)
+
+    last_signature = signature()
+    while not stop_event.wait(CONFIG_RELOAD_INTERVAL):
+        current_signature = signature()
+        if current_signature != last_signature:
+            print(f"{Colors.CYAN}Configuration change detected. Reloading...{Colors.RESET}")
+            persona_path = get_settings().persona_path
+            reload_settings()
+            # Remember the attempt either way, so a broken file is reported once
+            # rather than on every tick until it is fixed. The signature taken
+            # before the reload is kept, so an edit made during it is not missed.
+            last_signature = current_signature
+            if get_settings().persona_path != persona_path:
+                # From now on a different persona file is watched.
+                last_signature = (current_signature[0], _file_signature(get_settings().persona_path))
+
+
+def start_settings_watcher() -> threading.Event:
+    """Starts watching the configuration for changes. Set the returned event to stop."""
+    get_settings()
+    stop_event = threading.Event()
+    threading.Thread(target=_watch_settings, args=(stop_event,), daemon=True).start()
+    return stop_event
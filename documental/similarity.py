@@ -0,0 +1,150 @@
+"""
+The Similarity Module: The Déjà Vu Detector
+
+Humans never print the same file twice. They print "report_final.docx", then
+"report_final (1).docx", then "report_final_v2.docx". This module recognizes
+such names as one document family, so the agent can hold a grudge against the
+whole lineage.
+
+Names are first canonicalized (case, extensions, copy and version markers are
+stripped). Canonical names that still differ are compared with MinHash
+signatures over character n-grams, and locality-sensitive hashing (LSH) buckets
+those signatures so a new name only has to be compared against a handful of
+likely relatives instead of every name ever printed. Those few candidates are
+then checked exactly. Numbers are what tell "invoice 1023" from "invoice 1024",
+so names only join a family if their numbers match as well.
+"""
+
+import random
+import re
+import zlib
+from collections import defaultdict
+
+from .const import (
+    DOC_LSH_BANDS,
+    DOC_LSH_ROWS,
+    DOC_NGRAM_SIZE,
+    DOC_SIMILARITY_THRESHOLD,
+)
+
+# A Mersenne prime larger than any CRC32 value, used for the universal hash family.
+_PRIME = (1 << 61) - 1
+# Fixed seed so signatures stay comparable across runs and machines.
+_rng = random.Random(1337)
+_HASH_PARAMS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(DOC_LSH_BANDS * DOC_LSH_ROWS)
+]
+
+# Applications often prefix the spooled document name with their own name.
+_APP_PREFIX = re.compile(
+    r"^(microsoft (office )?(word|excel|powerpoint|outlook)|adobe acrobat( reader)?|notepad) - "
+)
+# An extension has at least one letter, so "budget 1.5" keeps its ".5".
+_EXTENSION = re.compile(r"\.(?=[a-z0-9]*[a-z])[a-z0-9]{1,5}$")
+# Version and revision markers, including dotted ones like "v1.5" or "rev_2.0.1".
+# They are removed before separators are normalized, which would split them up.
+# The lookarounds stand in for word boundaries, which "_" would not give us.
+_VERSION = re.compile(r"(?<![a-z])(v|ver|version|rev)[\s_.\-]?\d+([._]\d+)*(?![a-z0-9])")
+_SEPARATORS = re.compile(r"[\s_.\-]+")
+# Copy counters, "copy of", and the ever-hopeful "final".
+_NOISE = re.compile(r"\(\d+\)|\bcopy( of)?\b|\bfinal\b")
+# Brackets emptied by removing the noise, as in "resume (final)".
+_EMPTY_BRACKETS = re.compile(r"\(\s*\)|\[\s*\]")
+_DIGITS = re.compile(r"\d+")
+
+
+def canonicalize_document_name(name: str) -> str:
+    """
+    Reduces a document name to the part that identifies the document itself.
+
+    For example, "Microsoft Word - Report_Final (1).docx" and
+    "report_final_v2.docx" both become "report", and "budget v1.5.xlsx"
+    becomes "budget".
+    """
+    name = name.replace("\\", "/").rsplit("/", 1)[-1].lower().strip()
+    name = _APP_PREFIX.sub("", name)
+    name = _EXTENSION.sub("", name)
+    canonical = _VERSION.sub(" ", name)
+    canonical = _SEPARATORS.sub(" ", canonical)
+    canonical = _NOISE.sub(" ", canonical)
+    canonical = _EMPTY_BRACKETS.sub(" ", canonical)
+    canonical = " ".join(canonical.split())
+    # A name made only of noise ("final.pdf") is still better than nothing.
+    return canonical or " ".join(_SEPARATORS.sub(" ", name).split())
+
+
+def ngram_hashes(text: str) -> set:
+    """Returns the hashed character n-grams of a string, padded so word edges count."""
+    padded = f" {text} "
+    return {
+        zlib.crc32(padded[i : i + DOC_NGRAM_SIZE].encode("utf-8"))
+        for i in range(max(1, len(padded) - DOC_NGRAM_SIZE + 1))
+    }
+
+
+def jaccard_similarity(text_a: str, text_b: str) -> float:
+    """Computes the exact Jaccard similarity of two strings' character n-grams."""
+    shingles_a, shingles_b = ngram_hashes(text_a), ngram_hashes(text_b)
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+def minhash_signature(text: str) -> tuple:
+    """Computes the MinHash signature of a string's character n-grams."""
+    shingles = ngram_hashes(text)
+    return tuple(
+        min((a * shingle + b) % _PRIME for shingle in shingles) for a, b in _HASH_PARAMS
+    )
+
+
+class DocumentIndex:
+    """
+    Maps canonical document names to document families in sub-linear time.
+
+    Exact canonical matches are a dictionary lookup. Otherwise the name's
+    signature is split into LSH bands, and only names sharing at least one band
+    bucket with the same numbers in them are compared in full.
+    """
+
+    def __init__(self):
+        self.families = {}
+        self.signatures = {}
+        self.buckets = defaultdict(set)
+
+    def _band_keys(self, signature: tuple) -> list:
+        return [
+            (band, signature[band * DOC_LSH_ROWS : (band + 1) * DOC_LSH_ROWS])
+            for band in range(DOC_LSH_BANDS)
+        ]
+
+    def add(self, canonical: str, family_id: str):
+        """Registers a canonical name as belonging to a family."""
+        if canonical in self.families:
+            return
+        signature = minhash_signature(canonical)
+        self.families[canonical] = family_id
+        self.signatures[canonical] = signature
+        for key in self._band_keys(signature):
+            self.buckets[key].add(canonical)
+
+    def find(self, canonical: str):
+        """Returns the family ID of the closest known relative of a canonical name, or None."""
+        if canonical in self.families:
+            return self.families[canonical]
+
+        signature = minhash_signature(canonical)
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        # The signature estimate is too coarse to decide on its own, and the
+        # candidates are few, so they are scored exactly.
+        numbers = _DIGITS.findall(canonical)
+        best_family, best_score = None, DOC_SIMILARITY_THRESHOLD
+        for candidate in candidates:
+            if _DIGITS.findall(candidate) != numbers:
+                continue
+            score = jaccard_similarity(canonical, candidate)
+            if score >= best_score:
+                best_family, best_score = self.families[candidate], score
+        return best_family
@@ -0,0 +1,231 @@
+"""
+The Supervisor Module: The Shift Manager
+
+This module keeps an eye on the printer watchers themselves. It periodically
+re-enumerates the installed printers, starts a watcher for every new queue,
+retires watchers for printers that were removed, and restarts watchers that
+died, backing off exponentially if one keeps crashing. Each watcher's health
+is tracked and logged periodically, so a printer that keeps failing does not
+go unnoticed.
+"""
+
+import threading
+import time
+
+from .const import (
+    PRINTER_DISCOVERY_INTERVAL,
+    WATCHER_HEALTH_REPORT_INTERVAL,
+    WATCHER_RESTART_DELAY,
+    WATCHER_RESTART_MAX_DELAY,
+    WATCHER_STABLE_SECONDS,
+    Colors,
+)
+from .utils import get_available_printers
+
+
+class WatcherHealth:
+    """The state of a single printer watcher, updated by the watcher thread itself."""
+
+    def __init__(self, printer_name: str):
+        self.printer_name = printer_name
+        self.state = "starting"
+        self.started_at = None
+        self.restarts = 0
+        self.consecutive_crashes = 0
+        self.next_restart_at = None
+        self.event_count = 0
+        self.last_event_at = None
+        self.last_error = None
+
+    def record_event(self):
+        """Called by the watcher for every event it queues."""
+        self.event_count += 1
+        self.last_event_at = time.time()
+
+    def record_error(self, message: str):
+        """Called by the watcher when the monitor reports an error."""
+        self.last_error = message
+
+    def describe(self) -> str:
+        """Summarizes the watcher's health in one line."""
+        parts = [self.state, f"{self.event_count} events", f"{self.restarts} restarts"]
+        if self.last_event_at is not None:
+            parts.append(f"last event {time.time() - self.last_event_at:.0f}s ago")
+        if self.state == "backoff" and self.next_restart_at:
+            parts.append(f"restarting in {max(0.0, self.next_restart_at - time.monotonic()):.0f}s")
+        if self.last_error:
+            parts.append(f"last error: {self.last_error}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "events": self.event_count,
+            "last_event_at": self.last_event_at,
+            "last_error": self.last_error,
+            "next_restart_in": (
+                max(0.0, self.next_restart_at - time.monotonic())
+                if self.next_restart_at
+                else None
+            ),
+        }
+
+
+class _Watcher:
+    """A running watcher thread together with its stop signal and health."""
+
+    def __init__(self, printer_name: str):
+        self.health = WatcherHealth(printer_name)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+
+class PrinterSupervisor:
+    """
+    Keeps exactly one healthy watcher running per installed printer.
+
+    Args:
+        worker_target: The thread function that watches one printer. It is called
+            as `worker_target(printer_name, *worker_args, stop_event, health)` and
+            must return once `stop_event` is set.
+        worker_args: Extra positional arguments passed to every watcher.
+        discover: Returns the names of the printers that should be watched.
+        interval: Seconds between printer discoveries.
+        report_interval: Seconds between health reports in the log.
+    """
+
+    def __init__(
+        self,
+        worker_target,
+        worker_args: tuple = (),
+        discover=get_available_printers,
+        interval: float = PRINTER_DISCOVERY_INTERVAL,
+        report_interval: float = WATCHER_HEALTH_REPORT_INTERVAL,
+    ):
+        self.worker_target = worker_target
+        self.worker_args = worker_args
+        self.discover = discover
+        self.interval = interval
+        self.report_interval = report_interval
+        self.watchers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start_watcher(self, watcher: _Watcher):
+        health = watcher.health
+        watcher.stop_event = threading.Event()
+        health.state = "running"
+        health.started_at = time.monotonic()
+        health.next_restart_at = None
+        watcher.thread = threading.Thread(
+            target=self.worker_target,
+            args=(health.printer_name, *self.worker_args, watcher.stop_event, health),
+            daemon=True,
+        )
+        watcher.thread.start()
+
+    def sync_printers(self):
+        """Starts watchers for new printers and stops watchers for removed ones."""
+        try:
+            printers = set(self.discover())
+        except Exception as e:
+            print(f"{Colors.RED}Error fetching printers: {e}{Colors.RESET}")
+            return
+
+        with self._lock:
+            if not printers and self.watchers:
+                # An empty list is far more likely a spooler hiccup than every
+                # printer being uninstalled at once.
+                print(
+                    f"{Colors.YELLOW}Printer discovery returned nothing. Keeping the current watchers.{Colors.RESET}"
+                )
+                return
+
+            for printer_name in sorted(printers - self.watchers.keys()):
+                print(f"{Colors.GREEN}Now watching printer '{printer_name}'.{Colors.RESET}")
+                watcher = _Watcher(printer_name)
+                self.watchers[printer_name] = watcher
+                self._start_watcher(watcher)
+
+            for printer_name in sorted(self.watchers.keys() - printers):
+                print(
+                    f"{Colors.YELLOW}Printer '{printer_name}' was removed. Stopping its watcher.{Colors.RESET}"
+                )
+                self.watchers.pop(printer_name).stop_event.set()
+
+    def check_watchers(self):
+        """Detects crashed watchers and restarts them once their backoff has elapsed."""
+        now = time.monotonic()
+        with self._lock:
+            for watcher in self.watchers.values():
+                health = watcher.health
+
+                if health.state == "running":
+                    if watcher.thread.is_alive():
+                        if now - health.started_at >= WATCHER_STABLE_SECONDS:
+                            health.consecutive_crashes = 0
+                        continue
+                    health.consecutive_crashes += 1
+                    delay = min(
+                        WATCHER_RESTART_DELAY * 2 ** (health.consecutive_crashes - 1),
+                        WATCHER_RESTART_MAX_DELAY,
+                    )
+                    health.state = "backoff"
+                    health.next_restart_at = now + delay
+                    print(
+                        f"{Colors.RED}Watcher for '{health.printer_name}' stopped unexpectedly. "
+                        f"Restarting in {delay} seconds.{Colors.RESET}"
+                    )
+
+                elif health.state == "backoff" and now >= health.next_restart_at:
+                    health.restarts += 1
+                    print(f"{Colors.CYAN}Restarting watcher for '{health.printer_name}'.{Colors.RESET}")
+                    self._start_watcher(watcher)
+
+    def health(self) -> dict:
+        """Returns a snapshot of every watcher's health, keyed by printer name."""
+        with self._lock:
+            return {name: w.health.as_dict() for name, w in self.watchers.items()}
+
+    def report_health(self):
+        """Logs the health of every watcher, flagging the ones that are not running."""
+        with self._lock:
+            lines = [
+                (w.health.state, f"  '{name}': {w.health.describe()}")
+                for name, w in sorted(self.watchers.items())
+            ]
+        if not lines:
+            return
+        print(f"{Colors.BLUE}--- Watcher Health ---{Colors.RESET}")
+        for state, line in lines:
+            color = Colors.GREEN if state == "running" else Colors.YELLOW
+            print(f"{color}{line}{Colors.RESET}")
+
+    def _run(self):
+        # `start` has just done the first discovery.
+        next_discovery = time.monotonic() + self.interval
+        next_report = time.monotonic() + self.report_interval
+        while not self._stop.is_set():
+            if time.monotonic() >= next_discovery:
+                self.sync_printers()
+                next_discovery = time.monotonic() + self.interval
+            self.check_watchers()
+            if time.monotonic() >= next_report:
+                self.report_health()
+                next_report = time.monotonic() + self.report_interval
+            self._stop.wait(1)
+
+    def start(self):
+        """Performs the first discovery and then supervises on a background thread."""
+        self.sync_printers()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the supervisor and asks every watcher to shut down."""
+        self._stop.set()
+        with self._lock:
+            for watcher in self.watchers.values():
+                watcher.stop_event.set()
@@ -9,9 +9,21 @@ Keeping them here avoids cluttering the main logic modules.
 import json
 import os
 
-import win32print
-
-from .const import DEFAULT_ENDPOINT, Colors
+from .const import (
+    DEFAULT_ENDPOINT,
+    JOB_STATUS_BLOCKED_DEVQ,
+    JOB_STATUS_DELETED,
+    JOB_STATUS_DELETING,
+    JOB_STATUS_ERROR,
+    JOB_STATUS_OFFLINE,
+    JOB_STATUS_PAPEROUT,
+    JOB_STATUS_PAUSED,
+    JOB_STATUS_PRINTED,
+    JOB_STATUS_PRINTING,
+    JOB_STATUS_SPOOLING,
+    JOB_STATUS_USER_INTERVENTION,
+    Colors,
+)
 
 # It's better to define the path to the config file here, as this is the module
 # responsible for reading and creating it.
@@ -54,6 +66,24 @@ def load_or_create_config() -> dict:
         return {"llm": {"lm_studio_endpoint": DEFAULT_ENDPOINT}}
 
 
+def get_llm_endpoints(config: dict) -> list:
+    """
+    Returns the list of LLM endpoint URLs configured in `config.json`.
+
+    Multiple servers can be listed under `llm.endpoints`. The older single
+    `llm.lm_studio_endpoint` setting is still honoured, and the default endpoint
+    is used if neither is present.
+    """
+    llm_config = config.get("llm", {})
+    endpoints = llm_config.get("endpoints") or []
+    if isinstance(endpoints, str):
+        endpoints = [endpoints]
+    if not endpoints:
+        endpoints = [llm_config.get("lm_studio_endpoint", DEFAULT_ENDPOINT)]
+    # Preserve the configured order while dropping duplicates.
+    return list(dict.fromkeys(endpoints))
+
+
 def ordinal(n: int) -> str:
     """
     Converts an integer into its ordinal representation (e.g., 1 -> "1st", 2 -> "2nd").
@@ -70,6 +100,9 @@ def ordinal(n: int) -> str:
 
 def get_available_printers() -> list:
     """Returns a list of all installed printer names."""
+    # Imported here so that modules which only format job data don't require pywin32.
+    import win32print
+
     try:
         printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL, None, 1)
         return [printer[2] for printer in printers]
@@ -80,17 +113,17 @@ def get_available_printers() -> list:
 def get_job_status_string(status_code: int) -> str:
     """Converts a status code into a descriptive string."""
     status_map = {
-        win32print.JOB_STATUS_PAUSED: "Paused",
-        win32print.JOB_STATUS_ERROR: "Error",
-        win32print.JOB_STATUS_DELETING: "Deleting",
-        win32print.JOB_STATUS_SPOOLING: "Spooling",
-        win32print.JOB_STATUS_PRINTING: "Printing",
-        win32print.JOB_STATUS_OFFLINE: "Offline",
-        win32print.JOB_STATUS_PAPEROUT: "Paper Out",
-        win32print.JOB_STATUS_PRINTED: "Printed",
-        win32print.JOB_STATUS_DELETED: "Deleted",
-        win32print.JOB_STATUS_BLOCKED_DEVQ: "Blocked",
-        win32print.JOB_STATUS_USER_INTERVENTION: "User Intervention",
+        JOB_STATUS_PAUSED: "Paused",
+        JOB_STATUS_ERROR: "Error",
+        JOB_STATUS_DELETING: "Deleting",
+        JOB_STATUS_SPOOLING: "Spooling",
+        JOB_STATUS_PRINTING: "Printing",
+        JOB_STATUS_OFFLINE: "Offline",
+        JOB_STATUS_PAPEROUT: "Paper Out",
+        JOB_STATUS_PRINTED: "Printed",
+        JOB_STATUS_DELETED: "Deleted",
+        JOB_STATUS_BLOCKED_DEVQ: "Blocked",
+        JOB_STATUS_USER_INTERVENTION: "User Intervention",
     }
     for status, text in status_map.items():
         if status_code & status: